@@ -0,0 +1,325 @@
+"""Batched, cached generation of the `ai_story` texts
+
+Fills the role of the empty generate_ai_descriptions notebook: builds a
+prompt per artwork from its title, artist, long title, theme and curator
+description, and sends the prompts in batches to a pluggable
+text-generation backend under a rate limit, retrying quota and server
+errors. Outputs are cached in SQLite by a hash of prompt, model and
+parameters, so a re-run only generates stories for new artworks or
+artworks whose metadata changed. The merged metadata JSON is rewritten
+atomically as batches finish, so an interrupted run loses nothing.
+
+    python ai_stories.py --model gpt-4o-mini
+    python ai_stories.py --model gpt-4o --rate 2 --workers 8 --output /tmp/with_ai.json
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+
+from retry import TokenBucket, call_with_retries
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_INPUT = os.path.join(DATA_DIR, "real_museum_metadata.json")
+DEFAULT_OUTPUT = os.path.join(DATA_DIR, "real_museum_metadata_with_ai.json")
+DEFAULT_CACHE = os.path.join(DATA_DIR, "ai_story_cache.sqlite3")
+OPENAI_ENDPOINT = "https://api.openai.com/v1/chat/completions"
+
+PROMPT_TEMPLATE = """Write a short museum wall text (80 to 110 words) that tells the story of this artwork for a general audience.
+Describe what the viewer sees, the historical context and why it matters. Do not invent facts that contradict the curator's description.
+
+Title: {title}
+Artist: {artist}
+Full title: {longTitle}
+Theme: {theme}
+Curator description: {description}
+"""
+DEFAULT_PARAMS = {"temperature": 0.7, "max_tokens": 300}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stories (
+    key TEXT PRIMARY KEY,
+    artwork_id TEXT NOT NULL,
+    model TEXT NOT NULL,
+    output TEXT NOT NULL,
+    created_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+
+def build_prompt(record, template=PROMPT_TEMPLATE):
+    fields = {name: record.get(name) or "Unknown" for name in ("title", "artist", "longTitle", "theme")}
+    fields["description"] = record.get("description") or "(none)"
+    return template.format(**fields)
+
+
+def cache_key(prompt, model, params):
+    """Hash identifying one generation: the same prompt, model and parameters give the same key"""
+    payload = json.dumps({"prompt": prompt, "model": model, "params": params}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class StoryCache:
+    """Generated texts keyed by cache_key"""
+
+    def __init__(self, path=DEFAULT_CACHE):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def get_many(self, keys):
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            # Stay under SQLite's limit on bound parameters
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT key, output FROM stories WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                found.update(rows)
+        return found
+
+    def put_many(self, entries):
+        """Store (key, artwork_id, model, output) tuples"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO stories (key, artwork_id, model, output, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(*entry, now) for entry in entries],
+            )
+
+    def artwork_ids(self):
+        """Ids of artworks with at least one cached story"""
+        with self._lock:
+            return {row[0] for row in self._conn.execute("SELECT DISTINCT artwork_id FROM stories")}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class OpenAIBackend:
+    """Backend for any OpenAI-compatible chat completions endpoint
+
+    Chat completions take one prompt per request, so `batch_size` is 1: the
+    generator sends (and retries) each prompt on its own and runs
+    `workers` of them concurrently.
+    """
+
+    batch_size = 1
+
+    def __init__(self, model, api_key, endpoint=OPENAI_ENDPOINT, timeout=60):
+        self.model = model
+        self.api_key = api_key
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def generate(self, prompts, **params):
+        """One completion per prompt, in order"""
+        outputs = []
+        for prompt in prompts:
+            response = self.session.post(
+                self.endpoint,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                json={"model": self.model, "messages": [{"role": "user", "content": prompt}], **params},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            outputs.append(response.json()["choices"][0]["message"]["content"].strip())
+        return outputs
+
+
+class StoryGenerator:
+    """Generates missing stories in rate-limited batches through a backend and a cache
+
+    A batch is what the backend takes in one request: at most `batch_size`
+    prompts, and no more than the backend's own `batch_size` if it has one.
+    Each request is retried on its own, so a quota error never re-sends
+    prompts that already succeeded.
+    """
+
+    def __init__(self, backend, cache, params=None, template=PROMPT_TEMPLATE, batch_size=8, rate=1.0,
+                 workers=4, max_retries=5, backoff_base=1.0, backoff_max=60.0, sleep=time.sleep):
+        self.backend = backend
+        self.cache = cache
+        self.params = dict(DEFAULT_PARAMS if params is None else params)
+        self.template = template
+        self.batch_size = batch_size
+        self.bucket = TokenBucket(rate)
+        self.workers = workers
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+
+    def _generate(self, prompts):
+        # One token per prompt, so `rate` bounds prompts per second whatever the batch size
+        for _ in prompts:
+            self.bucket.acquire()
+        return call_with_retries(self._request, prompts, max_retries=self.max_retries,
+                                 backoff_base=self.backoff_base, backoff_max=self.backoff_max,
+                                 sleep=self._sleep, label="Generation")
+
+    def _request(self, prompts):
+        outputs = self.backend.generate(prompts, **self.params)
+        if len(outputs) != len(prompts):
+            raise ValueError(f"backend returned {len(outputs)} outputs for {len(prompts)} prompts")
+        return outputs
+
+    def run(self, records, on_batch=None):
+        """Set `ai_story` on every record; returns (cached, generated, failed) counts
+
+        Records whose generation fails keep the `ai_story` they had.
+        `on_batch()` is called after each batch is stored, e.g. to write the
+        merged output incrementally.
+        """
+        model = self.backend.model
+        jobs = []
+        for record in records:
+            prompt = build_prompt(record, self.template)
+            jobs.append((record, prompt, cache_key(prompt, model, self.params)))
+
+        cached = self.cache.get_many(key for _, _, key in jobs)
+        missing = []
+        for record, prompt, key in jobs:
+            if key in cached:
+                record["ai_story"] = cached[key]
+            else:
+                missing.append((record, prompt, key))
+        logger.info("%d stories cached, %d to generate", len(jobs) - len(missing), len(missing))
+
+        size = min(self.batch_size, getattr(self.backend, "batch_size", None) or self.batch_size)
+        batches = [missing[start:start + size] for start in range(0, len(missing), size)]
+        generated = failed = 0
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            futures = {pool.submit(self._generate, [prompt for _, prompt, _ in batch]): batch for batch in batches}
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    outputs = future.result()
+                except Exception as e:
+                    # Not cached, so the next run tries again
+                    logger.error("Batch of %d prompts failed: %s", len(batch), e)
+                    failed += len(batch)
+                    continue
+                self.cache.put_many((key, record["id"], model, output)
+                                    for (record, _, key), output in zip(batch, outputs))
+                for (record, _, _), output in zip(batch, outputs):
+                    record["ai_story"] = output
+                generated += len(batch)
+                if on_batch:
+                    on_batch()
+        return len(jobs) - len(missing), generated, failed
+
+
+def existing_stories(output_path):
+    """Stories of an earlier output, by artwork id"""
+    if not os.path.exists(output_path):
+        return {}
+    with open(output_path, encoding="utf-8") as f:
+        return {record["id"]: record.get("ai_story") for record in json.load(f) if record.get("ai_story")}
+
+
+def select_pending(records, existing, generated_before, regenerate=False):
+    """Records to run through the generator, and the number of stories kept as they are
+
+    Stories that never went through the cache (the original ones, or
+    hand-edited ones) are kept unless `regenerate`; cached artworks are
+    looked up by prompt hash, so only changed metadata is regenerated.
+    Every record starts from its existing story, which stays in the output
+    if generating a new one fails.
+    """
+    pending, kept = [], 0
+    for record in records:
+        story = record.get("ai_story") or existing.get(record["id"])
+        if story:
+            record["ai_story"] = story
+        if story and record["id"] not in generated_before and not regenerate:
+            kept += 1
+        else:
+            pending.append(record)
+    return pending, kept
+
+
+def write_output(records, output_path):
+    """Write the merged metadata JSON atomically"""
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(records, f, indent=4, ensure_ascii=False)
+    os.replace(tmp_path, output_path)
+
+
+def make_backend(name, model, api_key=None, endpoint=OPENAI_ENDPOINT):
+    if name == "openai":
+        if not api_key:
+            raise ValueError("an API key is required for the openai backend")
+        return OpenAIBackend(model, api_key, endpoint)
+    raise ValueError(f"unknown backend {name!r}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate ai_story texts for the museum metadata")
+    parser.add_argument("--input", default=DEFAULT_INPUT, help="metadata JSON without (or with stale) stories")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="merged metadata JSON to write")
+    parser.add_argument("--cache", default=DEFAULT_CACHE)
+    parser.add_argument("--backend", choices=["openai"], default="openai")
+    parser.add_argument("--model", default="gpt-4o-mini")
+    parser.add_argument("--api-key", default=os.environ.get("OPENAI_API_KEY"), help="default: $OPENAI_API_KEY")
+    parser.add_argument("--endpoint", default=OPENAI_ENDPOINT)
+    parser.add_argument("--temperature", type=float, default=DEFAULT_PARAMS["temperature"])
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_PARAMS["max_tokens"])
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=1.0, help="maximum prompts per second")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--regenerate", action="store_true",
+                        help="replace stories in the existing output that are not in the cache")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    try:
+        backend = make_backend(args.backend, args.model, args.api_key, args.endpoint)
+    except ValueError as e:
+        parser.error(str(e))
+
+    with open(args.input, encoding="utf-8") as f:
+        records = json.load(f)
+    params = {"temperature": args.temperature, "max_tokens": args.max_tokens}
+    cache = StoryCache(args.cache)
+    generator = StoryGenerator(backend, cache, params, batch_size=args.batch_size, rate=args.rate,
+                               workers=args.workers)
+
+    pending, kept = select_pending(records, existing_stories(args.output), cache.artwork_ids(), args.regenerate)
+    if kept:
+        logger.info("Keeping %d existing stories that were not generated by this pipeline", kept)
+
+    last_write = [0.0]
+
+    def flush():
+        if time.monotonic() - last_write[0] >= 5:
+            write_output(records, args.output)
+            last_write[0] = time.monotonic()
+
+    cached, generated, failed = generator.run(pending, on_batch=flush)
+    write_output(records, args.output)
+    cache.close()
+    print(f"{generated} stories generated, {cached} from cache, {failed} failed; wrote '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""AI vs. curator analysis of the study data, without the Excel round-trip
+
+Reads the artwork views and exhibition summaries straight from the local
+outbox (or from CSV/Parquet/Excel dumps), joins them with the post
+questionnaire by participant code and compares the two groups on every
+questionnaire dimension and dwell-time measure at once:
+
+    python analysis.py --questionnaire post.csv
+    python analysis.py --views views.parquet --summary summary.csv --questionnaire post.xlsx --resamples 10000
+    python analysis.py --mirror data/sheets_mirror.sqlite3
+
+Confidence intervals come from a bootstrap of the difference in means and
+p-values from a permutation test. Both are vectorized over resamples and
+over all measures, so 10k resamples take seconds. When SciPy is installed
+the notebook's Shapiro / t-test / Mann-Whitney choice is reported as well.
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from outbox import DEFAULT_PATH as OUTBOX_PATH, Outbox, QUESTIONNAIRE_SHEET, SUMMARY_SHEET, VIEWS_SHEET
+from sheets_mirror import SheetsMirror
+
+GROUPS = ("ai", "curator")
+DIMENSIONS = ("Quality", "Engagement", "Trustworthiness")
+
+# Resamples are drawn in chunks so memory stays bounded for large studies
+CHUNK = 1000
+
+
+def read_table(path, sheet_name=None):
+    """DataFrame from a CSV, Parquet or Excel file"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".parquet":
+        return pd.read_parquet(path)
+    if extension in (".xlsx", ".xls"):
+        return pd.read_excel(path, sheet_name=sheet_name or 0)
+    return pd.read_csv(path)
+
+
+def read_outbox(path=OUTBOX_PATH):
+    """Artwork views and exhibition summaries stored in the local outbox"""
+    if not os.path.exists(path):
+        return pd.DataFrame(), pd.DataFrame()
+    outbox = Outbox(path, readonly=True)
+    try:
+        frames = {}
+        for worksheet in (VIEWS_SHEET, SUMMARY_SHEET):
+            parts = [pd.DataFrame(record["rows"], columns=record["header"])
+                     for record in outbox.records(worksheet=worksheet)]
+            frames[worksheet] = pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()
+    finally:
+        outbox.close()
+    return frames[VIEWS_SHEET], frames[SUMMARY_SHEET]
+
+
+def read_mirror(path):
+    """Artwork views, exhibition summaries and questionnaire from a local worksheet mirror"""
+    mirror = SheetsMirror(None, path)
+    try:
+        return tuple(mirror.frame(sheet) for sheet in (VIEWS_SHEET, SUMMARY_SHEET, QUESTIONNAIRE_SHEET))
+    finally:
+        mirror.close()
+
+
+def find_code_column(df):
+    """Name of the participant code column of a questionnaire export, or None"""
+    for column in df.columns:
+        if "code" in str(column).lower():
+            return column
+    return None
+
+
+def dimension_scores(questionnaire, dimensions=DIMENSIONS):
+    """Per-participant average of each dimension's items, e.g. `Quality_Avg`"""
+    scores = pd.DataFrame(index=questionnaire.index)
+    for dimension in dimensions:
+        items = [column for column in questionnaire.columns if str(column).startswith(dimension)]
+        scores[f"{dimension}_Avg"] = questionnaire[items].apply(pd.to_numeric, errors="coerce").mean(axis=1)
+    return scores
+
+
+def clean_views(views):
+    """Views with numeric dwell times and normalized group labels"""
+    views = views.copy()
+    views["time_spent_seconds"] = pd.to_numeric(views["time_spent_seconds"], errors="coerce")
+    views["group"] = views["group"].astype(str).str.strip().str.lower()
+    return views.dropna(subset=["time_spent_seconds"])
+
+
+def exhibition_measures(summary):
+    """Per-participant exhibition size and share of chosen descriptions written by the AI"""
+    if summary.empty:
+        return pd.DataFrame(columns=["user_code", "exhibition_size", "ai_choice_share"])
+    sizes = summary["selected_ids"].fillna("").astype(str).str.split(",").map(
+        lambda ids: sum(1 for artwork_id in ids if artwork_id.strip()))
+    choices = []
+    for code, preferences in zip(summary["user_code"], summary["preferences"]):
+        for preference in json.loads(preferences or "{}").values():
+            source = preference["description_A_source"] if preference["user_choice"] == "Description A" \
+                else preference["description_B_source"]
+            choices.append((code, source == "ai"))
+    measures = pd.DataFrame({"user_code": summary["user_code"], "exhibition_size": sizes})
+    if choices:
+        shares = pd.DataFrame(choices, columns=["user_code", "ai"]).groupby("user_code")["ai"].mean()
+        measures["ai_choice_share"] = measures["user_code"].map(shares)
+    else:
+        measures["ai_choice_share"] = np.nan
+    return measures.drop_duplicates("user_code", keep="last")
+
+
+def participant_table(views=None, summary=None, questionnaire=None, code_column=None):
+    """One row per participant with group, dimension averages and dwell-time measures"""
+    parts = []
+    if views is not None and not views.empty:
+        views = clean_views(views)
+        dwell = views.groupby("user_code").agg(
+            view_group=("group", "first"),
+            artworks_viewed=("time_spent_seconds", "size"),
+            dwell_total=("time_spent_seconds", "sum"),
+            dwell_mean=("time_spent_seconds", "mean"),
+            dwell_median=("time_spent_seconds", "median"),
+        )
+        parts.append(dwell)
+    if summary is not None and not summary.empty:
+        parts.append(exhibition_measures(summary).set_index("user_code"))
+    if questionnaire is not None and not questionnaire.empty:
+        code_column = code_column or find_code_column(questionnaire)
+        scores = dimension_scores(questionnaire)
+        scores["questionnaire_group"] = questionnaire["Group"].astype(str).str.strip().str.lower()
+        if code_column is not None:
+            scores.index = questionnaire[code_column].astype(str).str.strip()
+        elif parts:
+            raise ValueError("the questionnaire has no participant code column to join on; pass code_column")
+        parts.append(scores)
+    if not parts:
+        raise ValueError("no data to analyze")
+
+    table = parts[0].join(parts[1:], how="outer") if len(parts) > 1 else parts[0]
+    table.index.name = "user_code"
+    group = table["questionnaire_group"] if "questionnaire_group" in table else pd.Series(np.nan, index=table.index)
+    if "view_group" in table:
+        group = group.fillna(table["view_group"])
+    table["group"] = group
+    return table.drop(columns=[c for c in ("view_group", "questionnaire_group") if c in table]).reset_index()
+
+
+def artwork_dwell(views):
+    """Dwell-time statistics per artwork and group, in one groupby pass"""
+    views = clean_views(views)
+    stats = views.groupby(["artwork_id", "group"])["time_spent_seconds"].agg(["count", "mean", "median", "std"])
+    stats = stats.unstack("group")
+    stats.columns = [f"{group}_{stat}" for stat, group in stats.columns]
+    titles = views.drop_duplicates("artwork_id").set_index("artwork_id")["title"] if "title" in views else None
+    if titles is not None:
+        stats.insert(0, "title", titles)
+    return stats.reset_index()
+
+
+def _nanmean(values, axis):
+    # Resamples of a measure that is missing for every drawn participant stay NaN
+    counts = np.sum(~np.isnan(values), axis=axis)
+    sums = np.nansum(values, axis=axis)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+def bootstrap_differences(x1, x2, resamples, rng):
+    """Bootstrap distribution of mean(x1) - mean(x2) for every column; shape (resamples, measures)"""
+    out = np.empty((resamples, x1.shape[1]))
+    for start in range(0, resamples, CHUNK):
+        size = min(CHUNK, resamples - start)
+        draw1 = x1[rng.integers(0, len(x1), size=(size, len(x1)))]
+        draw2 = x2[rng.integers(0, len(x2), size=(size, len(x2)))]
+        out[start:start + size] = _nanmean(draw1, axis=1) - _nanmean(draw2, axis=1)
+    return out
+
+
+def permutation_differences(x1, x2, resamples, rng):
+    """Differences in means under random relabeling of the groups; shape (resamples, measures)"""
+    pooled = np.concatenate([x1, x2])
+    n1 = len(x1)
+    out = np.empty((resamples, pooled.shape[1]))
+    for start in range(0, resamples, CHUNK):
+        size = min(CHUNK, resamples - start)
+        order = np.argsort(rng.random((size, len(pooled))), axis=1)
+        shuffled = pooled[order]
+        out[start:start + size] = _nanmean(shuffled[:, :n1], axis=1) - _nanmean(shuffled[:, n1:], axis=1)
+    return out
+
+
+def _classic_tests(x1, x2):
+    """The notebook's test choice: t-test if both groups look normal, Mann-Whitney U otherwise"""
+    try:
+        from scipy.stats import mannwhitneyu, shapiro, ttest_ind
+    except ImportError:
+        return {}
+    if len(x1) < 3 or len(x2) < 3:
+        return {}
+    if shapiro(x1).pvalue > 0.05 and shapiro(x2).pvalue > 0.05:
+        test = ttest_ind(x1, x2)
+        return {"test": "t-test", "statistic": test.statistic, "test_p": test.pvalue}
+    test = mannwhitneyu(x1, x2, alternative="two-sided")
+    return {"test": "Mann-Whitney U", "statistic": test.statistic, "test_p": test.pvalue,
+            "rank_biserial": 1 - (2 * test.statistic) / (len(x1) * len(x2))}
+
+
+def compare_groups(table, measures=None, resamples=10000, confidence=0.95, seed=None, groups=GROUPS):
+    """Group means, bootstrap CI of the difference and permutation p-value for every measure
+
+    Measures with fewer than two values in either group (e.g. exhibition
+    measures of a group that never chose an exhibition) are reported with
+    their means and counts only; their difference statistics stay NaN.
+    """
+    if measures is None:
+        measures = [column for column in table.columns
+                    if column not in ("user_code", "group") and pd.api.types.is_numeric_dtype(table[column])]
+    values = table[measures].to_numpy(dtype=float)
+    mask1 = (table["group"] == groups[0]).to_numpy()
+    mask2 = (table["group"] == groups[1]).to_numpy()
+    x1, x2 = values[mask1], values[mask2]
+    if not len(x1) or not len(x2):
+        raise ValueError(f"both groups {groups} need at least one participant")
+
+    n1, n2 = np.sum(~np.isnan(x1), axis=0), np.sum(~np.isnan(x2), axis=0)
+    testable = (n1 >= 2) & (n2 >= 2)
+    observed = np.full(len(measures), np.nan)
+    low, high, p_values, cohen_d = observed.copy(), observed.copy(), observed.copy(), observed.copy()
+    if testable.any():
+        t1, t2 = x1[:, testable], x2[:, testable]
+        rng = np.random.default_rng(seed)
+        observed[testable] = _nanmean(t1, axis=0) - _nanmean(t2, axis=0)
+        boot = bootstrap_differences(t1, t2, resamples, rng)
+        alpha = (1 - confidence) / 2
+        low[testable], high[testable] = np.nanquantile(boot, [alpha, 1 - alpha], axis=0)
+
+        # Relabelings that leave a group without values for a measure do not count
+        perm = permutation_differences(t1, t2, resamples, rng)
+        valid = np.sum(~np.isnan(perm), axis=0)
+        exceed = np.sum(np.abs(perm) >= np.abs(observed[testable]) - 1e-12, axis=0)
+        p_values[testable] = (exceed + 1) / (valid + 1)
+
+        std1, std2 = np.nanstd(t1, axis=0, ddof=1), np.nanstd(t2, axis=0, ddof=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            cohen_d[testable] = observed[testable] / np.sqrt((std1 ** 2 + std2 ** 2) / 2)
+
+    rows = []
+    for i, measure in enumerate(measures):
+        column1, column2 = x1[:, i], x2[:, i]
+        column1, column2 = column1[~np.isnan(column1)], column2[~np.isnan(column2)]
+        rows.append({
+            "measure": measure,
+            f"mean_{groups[0]}": np.mean(column1) if len(column1) else np.nan,
+            f"mean_{groups[1]}": np.mean(column2) if len(column2) else np.nan,
+            f"n_{groups[0]}": len(column1),
+            f"n_{groups[1]}": len(column2),
+            "difference": observed[i],
+            "ci_low": low[i],
+            "ci_high": high[i],
+            "permutation_p": p_values[i],
+            "cohen_d": cohen_d[i],
+            **_classic_tests(column1, column2),
+        })
+    return pd.DataFrame(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compare the AI and curator groups on all study measures")
+    parser.add_argument("--outbox", default=os.environ.get("DIGITALMUSEUM_OUTBOX", OUTBOX_PATH),
+                        help="local outbox to read views and summaries from (default)")
+    parser.add_argument("--mirror", help="worksheet mirror (sheets_mirror.py) instead of the outbox")
+    parser.add_argument("--views", help="artwork views dump (CSV/Parquet/Excel) instead of the outbox")
+    parser.add_argument("--summary", help="exhibition summary dump instead of the outbox")
+    parser.add_argument("--questionnaire", help="post questionnaire (CSV/Parquet/Excel)")
+    parser.add_argument("--questionnaire-sheet", default=QUESTIONNAIRE_SHEET)
+    parser.add_argument("--code-column", help="participant code column of the questionnaire")
+    parser.add_argument("--resamples", type=int, default=10000)
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", help="directory to write participants.csv, comparison.csv and artworks.csv to")
+    args = parser.parse_args(argv)
+
+    questionnaire = None
+    if args.mirror:
+        views, summary, questionnaire = read_mirror(args.mirror)
+        questionnaire = None if questionnaire.empty else questionnaire
+    elif args.views or args.summary:
+        views = read_table(args.views) if args.views else None
+        summary = read_table(args.summary) if args.summary else None
+    elif os.path.exists(args.outbox):
+        views, summary = read_outbox(args.outbox)
+    else:
+        views = summary = None
+    if args.questionnaire:
+        questionnaire = read_table(args.questionnaire, args.questionnaire_sheet)
+
+    table = participant_table(views, summary, questionnaire, args.code_column)
+    comparison = compare_groups(table, resamples=args.resamples, confidence=args.confidence, seed=args.seed)
+    artworks = artwork_dwell(views) if views is not None and not views.empty else None
+
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print(comparison.to_string(index=False, float_format=lambda v: f"{v:.4g}"))
+        if artworks is not None:
+            print()
+            print(artworks.to_string(index=False, float_format=lambda v: f"{v:.2f}"))
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        table.to_csv(os.path.join(args.out, "participants.csv"), index=False)
+        comparison.to_csv(os.path.join(args.out, "comparison.csv"), index=False)
+        if artworks is not None:
+            artworks.to_csv(os.path.join(args.out, "artworks.csv"), index=False)
+        print(f"\nResults written to '{args.out}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,123 +3,129 @@ import pandas as pd
 import random
 import time
 import os
-import io
-import requests
-from reportlab.lib.pagesizes import letter
-from reportlab.pdfgen import canvas
-from reportlab.lib.units import inch
-from reportlab.lib import colors
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from textwrap import wrap
-from PIL import Image as PILImage
 import gspread
 from google.oauth2.service_account import Credentials
 import json
 import hashlib
+import uuid
+import logging
+import metrics
+from sheets_writer import SheetsWriter
+from sheets_connection import SheetsConnection
+import catalog_store
+from image_cache import ImageCache, DEFAULT_DIR as IMAGE_CACHE_DIR
+from outbox import (Outbox, OutboxDrainer, dataframe_to_record, DEFAULT_PATH as OUTBOX_PATH, SPREADSHEET_NAME,
+                    SUMMARY_SHEET, VIEWS_SHEET)
+from checkpoints import CheckpointStore, DEFAULT_PATH as CHECKPOINTS_PATH
+from exhibition_pdf import exhibition_pages, generate_exhibition_pdf
+from pdf_jobs import JobQueue, QueueFull
+from search_index import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+# Metrics are off unless enabled through the environment (see metrics.py)
+metrics.configure_from_env()
+rerun_started = time.perf_counter()
 
 # Set up connection to Google Sheets
 @st.cache_resource
-def init_google_sheets():
-    """Initialize Google Sheets connection with caching"""
+def get_sheets_connection():
+    """Spreadsheet and worksheet handles, resolved lazily and shared by all sessions"""
     try:
         scope = ["https://www.googleapis.com/auth/spreadsheets", "https://www.googleapis.com/auth/drive"]
-        credentials_dict = st.secrets["gspread"]
-        credentials = Credentials.from_service_account_info(credentials_dict, scopes=scope)
-        client = gspread.authorize(credentials)
-        return client
+        credentials_dict = dict(st.secrets["gspread"])
+        spreadsheet_key = st.secrets.get("spreadsheet_key") or os.environ.get("DIGITALMUSEUM_SPREADSHEET_KEY")
     except Exception as e:
         st.error(f"Failed to initialize Google Sheets: {e}")
         return None
 
-# Initialize client
-client = init_google_sheets()
+    def authorize():
+        credentials = Credentials.from_service_account_info(credentials_dict, scopes=scope)
+        return gspread.authorize(credentials)
 
-# --- Test Google Sheets Connection ---
-if client:
-    try:
-        test_sheet = client.open("Digital Museum Streamlit Data Sheet").sheet1
-        
-    except Exception as e:
-        st.error(f"Failed to connect to Google Sheets: {e}")
-        client = None
+    # The connection is checked in the background, never on the request path
+    return SheetsConnection(authorize, spreadsheet_key, SPREADSHEET_NAME).start_health_check()
+
+connection = get_sheets_connection()
+
+# Shared Background Writer
+@st.cache_resource
+def get_sheets_writer():
+    """Process-wide writer so rows from all sessions are batched together"""
+    return SheetsWriter()
+
+def open_worksheet(name):
+    """Cached handle for a worksheet of the study spreadsheet"""
+    if not connection:
+        raise RuntimeError("Google Sheets client not available")
+    return connection.worksheet(name)
+
+# Local Outbox
+@st.cache_resource
+def get_outbox_drainer():
+    """Durable local outbox plus the background thread that ships it to Google Sheets"""
+    outbox = Outbox(os.environ.get("DIGITALMUSEUM_OUTBOX", OUTBOX_PATH))
+    on_error = connection.report_error if connection else None
+    return OutboxDrainer(outbox, open_worksheet, get_sheets_writer(), on_error=on_error).start()
+
+# Started with the app, so records a previous process left behind are shipped right away
+drainer = get_outbox_drainer()
 
-# Write to Google Sheets Function
-def write_dataframe_to_sheets(sheet, df: pd.DataFrame):
-    """Write DataFrame to Google Sheets with error handling"""
-    try:
-        if df.empty:
-            st.warning("DataFrame is empty, skipping write operation.")
-            return False
-        
-        
-        
-        # Convert DataFrame to list of lists, handling NaN values
-        rows = df.fillna('').astype(str).values.tolist()
-        
-        # Check if sheet is empty using a more robust method
-        try:
-            # Try to get all values first
-            all_values = sheet.get_all_values()
-            sheet_is_empty = len(all_values) == 0 or (len(all_values) == 1 and all(cell == '' for cell in all_values[0]))
-            
-        except Exception as e:
-            # If get_all_values fails, assume sheet is empty
-            st.warning(f"Could not check sheet contents, assuming empty: {e}")
-            sheet_is_empty = True
-        
-        # Add headers if sheet is empty
-        if sheet_is_empty:
-            headers = df.columns.tolist()
-            
-            sheet.append_row(headers, value_input_option="USER_ENTERED")
-        
-        # Append data rows
-        
-        for i, row in enumerate(rows):
-            try:
-                sheet.append_row(row, value_input_option="USER_ENTERED")
-            except Exception as e:
-                st.error(f"Failed to append row {i+1}: {e}")
-                st.error(f"Row data: {row}")
-                raise
-        
-        st.success("Success.")
-        return True
-        
-    except Exception as e:
-        st.error(f"Failed to write DataFrame to Google Sheets: {e}")
-        st.error(f"DataFrame shape: {df.shape}")
-        st.error(f"DataFrame columns: {list(df.columns)}")
-        return False
 # Load Data
-@st.cache_data
-def load_museum_data():
-    """Load museum data with caching"""
-    base_path = os.path.dirname(__file__)
-    file_path = os.path.join(base_path, 'data', 'real_museum_metadata_with_ai.json')
-    
-    if os.path.exists(file_path):
-        return pd.read_json(file_path)
-    else:
-        st.error(f"Metadata file not found at {file_path}. Please check your data folder.")
+METADATA_PATH = os.path.join(os.path.dirname(__file__), 'data', 'real_museum_metadata_with_ai.json')
+CATALOG_DB_PATH = os.path.join(os.path.dirname(__file__), 'data', 'catalog.sqlite3')
+
+def check_metadata_available():
+    """Stop the app with an error if neither the metadata nor a compiled catalog exists"""
+    if not os.path.exists(METADATA_PATH) and not os.path.exists(CATALOG_DB_PATH):
+        st.error(f"Metadata file not found at {METADATA_PATH}. Please check your data folder.")
         st.stop()
 
-data = load_museum_data()
+@st.cache_resource
+def load_catalog():
+    """Id-indexed artwork catalog, built once per process
+
+    Uses the compiled SQLite catalog when it is up to date, so only the small
+    fields are loaded here and descriptions are read per artwork on demand.
+    """
+    check_metadata_available()
+    with metrics.span("load_catalog"):
+        return catalog_store.load_catalog(METADATA_PATH, CATALOG_DB_PATH)
+
+catalog = load_catalog()
+
+# Search Index
+@st.cache_resource(show_spinner="Preparing the collection search...")
+def get_search_index():
+    """Inverted index over the whole collection, built once per process on first use
+
+    The full metadata (with descriptions) is only needed to build the index,
+    so it is loaded here and not kept around.
+    """
+    check_metadata_available()
+    with metrics.span("load_museum_data"):
+        df = catalog_store.load_museum_data(METADATA_PATH, CATALOG_DB_PATH)
+    return SearchIndex.from_dataframe(df)
+
+# Image Cache
+@st.cache_resource
+def get_image_cache():
+    """Process-wide on-disk cache of resized artwork images"""
+    return ImageCache(os.environ.get("DIGITALMUSEUM_IMAGE_CACHE", IMAGE_CACHE_DIR))
 
 # Data Writing Function 
+@metrics.timed("write_data_to_sheets")
 def write_data_to_sheets():
-    """Write data to Google Sheets"""
-    if not client:
-        st.error("Google Sheets client not available")
-        return
-    
+    """Commit the session to the local outbox; the drainer ships it to Google Sheets"""
     try:
+        # One timestamp per session, reused by the CSV downloads
+        timestamp = st.session_state.completed_at = time.strftime("%Y-%m-%d %H:%M:%S")
+
         # Create df_views from session state
         df_views = pd.DataFrame(st.session_state.viewed_items)
         if not df_views.empty:
             df_views["user_code"] = st.session_state.user_code
-            df_views["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S")
+            df_views["timestamp"] = timestamp
 
         # Create df_summary if curation exists
         if "curated_exhibition" in st.session_state:
@@ -130,26 +136,25 @@ def write_data_to_sheets():
                 "selected_ids": ", ".join(exhibition.get("selected_ids", [])),
                 "preferences": json.dumps(exhibition.get("preferences", {}), ensure_ascii=False),
                 "user_code": st.session_state.user_code,
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S")
+                "timestamp": timestamp
             }])
         else:
             df_summary = pd.DataFrame()
 
-        # Write to sheets
-        views_sheet = client.open("Digital Museum Streamlit Data Sheet").worksheet("Artwork Views")
-        summary_sheet = client.open("Digital Museum Streamlit Data Sheet").worksheet("Exhibition Summary")
-
-        success = True
+        records = {}
         if not df_views.empty:
-            success &= write_dataframe_to_sheets(views_sheet, df_views)
+            records[VIEWS_SHEET] = dataframe_to_record(df_views)
         if not df_summary.empty:
-            success &= write_dataframe_to_sheets(summary_sheet, df_summary)
+            records[SUMMARY_SHEET] = dataframe_to_record(df_summary)
 
-        if success:
-            st.session_state.written_to_sheets = True
+        # One local durable write; delivery to Google Sheets happens in the background
+        drainer.outbox.add_session(st.session_state.user_code, st.session_state.session_id, records)
+        drainer.notify()
+        st.session_state.written_to_sheets = True
+        checkpoint(fields={"written_to_sheets": True, "completed_at": timestamp})
 
     except Exception as e:
-        st.error(f"Failed to write data to Google Sheets: {e}")
+        st.error(f"Failed to save session data: {e}")
 
 # Setup Session State 
 def initialize_session_state():
@@ -158,13 +163,14 @@ def initialize_session_state():
         "start_times": {},
         "viewed_items": [],
         "index": 0,
-        "selected_indices": random.sample(range(len(data)), min(20, len(data))),
+        "selected_indices": random.sample(range(len(catalog)), min(20, len(catalog))),
         "exhibition_title": "",
         "exhibition_description": "",
         "preferences": {},
         "exhibition_stage": "select_artworks",
         "written_to_sheets": False,
         "user_code": "",
+        "session_id": uuid.uuid4().hex,
         "group": None
     }
     
@@ -191,7 +197,7 @@ if not st.session_state.user_code or len(st.session_state.user_code) != 4:
         You'll view 16 artworks, each with a short description.  
         At the end, you are invited to curate your own mini-exhibition (optional) and then complete a short final questionnaire.
 
-         **Note**: We recommend completing this in one sitting, in a quiet place where you can stay focused. Please don't refresh or go back, as your progress may be lost.
+         **Note**: We recommend completing this in one sitting, in a quiet place where you can stay focused. If the page reloads or you get disconnected, enter the same code again to continue where you left off.
         """)
     
 
@@ -201,132 +207,268 @@ if st.session_state.user_code and not st.session_state.group:
     group_value = int(hash_digest, 16) % 2
     st.session_state.group = "ai" if group_value == 0 else "curator"
 
-# PDF Generation Function
-def generate_exhibition_pdf(title, description, artwork_ids, data, preferences):
-    """Generate PDF exhibition card"""
-    import tempfile
-    buffer = io.BytesIO()
-    c = canvas.Canvas(buffer, pagesize=letter)
-    width, height = letter
-
-    margin = 1 * inch
-    text_width = width - 2 * margin
-    image_width = width - 2 * margin
-    image_height = 4 * inch
-
-    # Cover Page
-    c.setFillColorRGB(1, 1, 1)
-    c.rect(0, 0, width, height, stroke=0, fill=1)
-    c.setFont("Helvetica-Bold", 28)
-    c.setFillColor(colors.HexColor("#2c3e50"))
-    c.drawCentredString(width / 2, height - 2 * inch, title)
-
-    c.setFont("Helvetica", 14)
-    c.setFillColor(colors.HexColor("#333333"))
-    wrapped_intro = wrap(description, width=80)
-    text = c.beginText(margin, height - 2.5 * inch)
-    text.setLeading(18)
-    for line in wrapped_intro:
-        text.textLine(line)
-    c.drawText(text)
-    c.showPage()
-
-    for aid in artwork_ids:
-        try:
-            row = data[data['id'] == aid].iloc[0]
-            artwork_title = row['title']
-            theme = row.get('theme', 'Unknown')
-            img_url = row['image_url']
-
-            pref = preferences.get(aid)
-            if not pref:
-                continue
-
-            chosen = pref['user_choice']
-            chosen_desc = row['description'] if pref['description_A_source'] == 'curator' and chosen == 'Description A' else \
-                           row['ai_story'] if pref['description_A_source'] == 'ai' and chosen == 'Description A' else \
-                           row['description'] if pref['description_B_source'] == 'curator' else row['ai_story']
-
-            c.setFillColorRGB(1, 1, 1)
-            c.rect(0, 0, width, height, stroke=0, fill=1)
-
-            c.setFont("Helvetica-Bold", 18)
-            c.setFillColor(colors.HexColor("#2c3e50"))
-            c.drawCentredString(width / 2, height - 1 * inch, artwork_title)
-
-            c.setFont("Helvetica", 12)
-            c.setFillColor(colors.HexColor("#7f8c8d"))
-            c.drawCentredString(width / 2, height - 1.3 * inch, f"Theme: {theme}")
-
-            y = height - 2 * inch
-
-            try:
-                response = requests.get(img_url, stream=True, timeout=10)
-                if response.status_code == 200:
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=".png") as tmp_file:
-                        tmp_file.write(response.content)
-                        tmp_file_path = tmp_file.name
-                    c.drawImage(tmp_file_path, margin, y - image_height, width=image_width, height=image_height, preserveAspectRatio=True, anchor='n', mask='auto')
-                    os.unlink(tmp_file_path)
-                    y -= image_height + 0.3 * inch
-                else:
-                    raise Exception("Image fetch failed")
-            except:
-                c.setFont("Helvetica", 10)
-                c.setFillColor(colors.red)
-                c.drawCentredString(width / 2, y, "[Image could not be loaded]")
-                y -= 0.4 * inch
-
-            c.setFont("Helvetica", 11)
-            c.setFillColor(colors.black)
-            wrapped_desc = []
-            for paragraph in chosen_desc.split("\n"):
-                wrapped_desc.extend(wrap(paragraph, width=100))
-
-            text = c.beginText(margin, y)
-            text.setLeading(14)
-            for line in wrapped_desc:
-                text.textLine(line)
-            c.drawText(text)
-
-            c.showPage()
-        except Exception as e:
-            st.error(f"Error processing artwork {aid}: {e}")
-            continue
+# Session Checkpoints
+@st.cache_resource
+def get_checkpoint_store():
+    """Process-wide store of participant progress, so a refresh resumes instead of restarting"""
+    return CheckpointStore(os.environ.get("DIGITALMUSEUM_CHECKPOINTS", CHECKPOINTS_PATH)).start_expiry()
+
+def checkpoint(fields=None, entries=None, items=None):
+    """Record a delta of this participant's progress (see CheckpointStore.update)"""
+    try:
+        get_checkpoint_store().update(st.session_state.user_code, fields, entries, items)
+    except Exception as e:
+        # Progress tracking must never interrupt the session itself
+        metrics.incr("checkpoint_errors_total")
+        logger.warning("Checkpoint failed: %s", e)
+
+def restore_sequence(sequence_ids):
+    """Map the checkpointed artwork sequence back to current catalog positions"""
+    remaining = [artwork_id for artwork_id in sequence_ids if artwork_id in catalog]
+    if len(remaining) < len(sequence_ids):
+        # Skip removed artworks; the participant stays on the same next artwork
+        removed_before = sum(1 for artwork_id in sequence_ids[:st.session_state.index] if artwork_id not in catalog)
+        st.session_state.index -= removed_before
+        logger.warning("%d artworks of participant %s's sequence are no longer in the catalog",
+                       len(sequence_ids) - len(remaining), st.session_state.user_code)
+    st.session_state.selected_indices = [catalog.position(artwork_id) for artwork_id in remaining]
+
+def restore_checkpoint():
+    """Resume a returning participant code, or start a checkpoint for a new one"""
+    code = st.session_state.user_code
+    if st.session_state.get("checkpoint_code") == code:
+        return
+    st.session_state.checkpoint_code = code
+    state = get_checkpoint_store().load(code)
+    if state is None:
+        fields = {name: st.session_state[name] for name in ("session_id", "group", "index", "exhibition_stage")}
+        # Ids, not catalog positions: the catalog may change before the participant returns
+        fields["sequence_ids"] = [catalog[position].id for position in st.session_state.selected_indices]
+        checkpoint(fields=fields)
+        return
 
-    c.save()
-    buffer.seek(0)
-    return buffer
+    sequence_ids = state.pop("sequence_ids", None)
+    positions = state.pop("selected_indices", [])
+    if sequence_ids is None:
+        # Checkpoints written before ids were stored hold catalog positions
+        sequence_ids = [catalog[position].id for position in positions if position < len(catalog)]
+    for name, value in state.items():
+        st.session_state[name] = value
+    restore_sequence(sequence_ids)
+    # Artworks that left the catalog since the checkpoint cannot be shown again
+    for name in ("picked_artworks", "selected_titles"):
+        if name in st.session_state:
+            st.session_state[name] = [artwork_id for artwork_id in st.session_state[name] if artwork_id in catalog]
+    # Radio widgets read their value from session state under their own key
+    for artwork_id, preference in st.session_state.preferences.items():
+        st.session_state[f"preference_{artwork_id}"] = preference["user_choice"]
+    # The artwork that was on screen is timed again from when it reappears
+    if st.session_state.index < len(st.session_state.selected_indices):
+        current = catalog[st.session_state.selected_indices[st.session_state.index]]
+        st.session_state.start_times.pop(current.id, None)
+    metrics.incr("checkpoint_restores_total")
+
+if st.session_state.user_code and len(st.session_state.user_code) == 4:
+    restore_checkpoint()
+
+# Prefetch
+PREFETCH_AHEAD = 2
+
+def prefetch_upcoming(count=PREFETCH_AHEAD):
+    """Warm the next artworks' images and texts while the current one is on screen"""
+    start = st.session_state.index + 1
+    for position in st.session_state.selected_indices[start:start + count]:
+        upcoming = catalog[position]
+        get_image_cache().prefetch(upcoming.image_url, "full")
+        # Texts load lazily from the compiled catalog; one indexed read each
+        upcoming.description
+
+# Interactive Sections
+HAS_FRAGMENTS = hasattr(st, "fragment")
+
+def fragment(func=None, *, run_every=None):
+    """Rerun only `func`'s section when its widgets change (or every `run_every`
+    seconds), where Streamlit supports it"""
+    if func is None:
+        return lambda func: fragment(func, run_every=run_every)
+    return st.fragment(func, run_every=run_every) if HAS_FRAGMENTS else func
+
+# Curator Mode Artwork Picker
+PICKER_PAGE_SIZE = 12
+ALL_THEMES = "All themes"
+
+def toggle_pick(artwork_id):
+    """Keep picked artworks across pages and searches, in the order they were picked"""
+    picked = st.session_state.picked_artworks
+    if st.session_state[f"select_{artwork_id}"]:
+        if artwork_id not in picked:
+            picked.append(artwork_id)
+    elif artwork_id in picked:
+        picked.remove(artwork_id)
+    checkpoint(fields={"picked_artworks": picked})
+
+def change_picker_page(step):
+    st.session_state.picker_page += step
+
+@fragment
+def artwork_picker():
+    """Search box, theme filter and one page of selectable thumbnails
+
+    With no search, the artworks the participant viewed are listed; a
+    search or theme filter looks through the whole collection.
+    """
+    st.session_state.setdefault("picked_artworks", [])
+    st.session_state.setdefault("picker_page", 0)
+    index = get_search_index()
+
+    col_query, col_theme = st.columns([2, 1])
+    with col_query:
+        query = st.text_input("Search the collection", key="picker_query",
+                              placeholder="Title, artist, theme or words from the descriptions")
+    # The theme widget holds its value in session state, so the page and its
+    # facet counts come from one search before the widget is drawn
+    theme = st.session_state.get("picker_theme", ALL_THEMES)
+    theme = None if theme == ALL_THEMES else theme
+
+    # A new search starts again from the first page
+    if st.session_state.get("picker_filter") != (query, theme):
+        st.session_state.picker_filter = (query, theme)
+        st.session_state.picker_page = 0
+
+    if query.strip() or theme:
+        result = index.search(query, theme, st.session_state.picker_page, PICKER_PAGE_SIZE)
+        st.session_state.picker_page = result.page
+        facets = result.themes
+    else:
+        result = None
+        facets = index.themes()
+    with col_theme:
+        st.selectbox("Theme", [ALL_THEMES, *facets], key="picker_theme",
+                     format_func=lambda name: name if name == ALL_THEMES else f"{name} ({facets.get(name, 0)})")
+
+    if result is not None:
+        # The index may come from a newer copy of the metadata than the catalog
+        artwork_ids = [artwork_id for artwork_id in result.ids if artwork_id in catalog]
+        st.caption(f"{result.total} artworks found")
+    else:
+        artwork_ids = list(dict.fromkeys(item["artwork_id"] for item in st.session_state.viewed_items))
+        st.caption("Artworks you viewed. Search to add others from the collection.")
+
+    # Thumbnails of the whole page are prefetched together; those not cached
+    # within the short wait load from the museum's URL this time
+    urls = [catalog.get(artwork_id).image_url for artwork_id in artwork_ids]
+    with metrics.span("image_grid"):
+        thumbnails = get_image_cache().get_many_or_urls(urls, "grid")
+
+    col_left, col_right = st.columns(2)
+    for i, artwork_id in enumerate(artwork_ids):
+        artwork = catalog.get(artwork_id)
+        with col_left if i % 2 == 0 else col_right:
+            st.markdown("**Select**")
+            st.checkbox("select", key=f"select_{artwork_id}", value=artwork_id in st.session_state.picked_artworks,
+                        on_change=toggle_pick, args=(artwork_id,), label_visibility="collapsed")
+            st.image(thumbnails.get(artwork.image_url, artwork.image_url), width=160)
+            st.caption(artwork.title)
+
+    if result is not None and result.pages > 1:
+        col_prev, col_page, col_next = st.columns([1, 2, 1])
+        with col_prev:
+            st.button("Previous page", key="picker_prev", disabled=result.page == 0,
+                      on_click=change_picker_page, args=(-1,))
+        with col_page:
+            st.caption(f"Page {result.page + 1} of {result.pages}")
+        with col_next:
+            st.button("Next page", key="picker_next", disabled=result.page + 1 >= result.pages,
+                      on_click=change_picker_page, args=(1,))
+
+    st.caption(f"{len(st.session_state.picked_artworks)} artworks selected")
+
+# Description Picker
+@fragment
+def description_choice(artwork_id):
+    """One artwork's two descriptions and the participant's choice between them"""
+    artwork_row = catalog.get(artwork_id)
+    title = artwork_row.title
+    image_url = artwork_row.image_url
+    curator_desc = artwork_row.description or "No curator description available."
+    ai_desc = artwork_row.ai_story or "No AI-generated description available."
+
+    desc_key = f"description_order_{artwork_id}"
+    if desc_key not in st.session_state:
+        descriptions = [("A", curator_desc, "curator"), ("B", ai_desc, "ai")]
+        random.shuffle(descriptions)
+        st.session_state[desc_key] = descriptions
+        checkpoint(fields={desc_key: descriptions})
+    else:
+        descriptions = st.session_state[desc_key]
+
+    st.markdown(f"### {title}")
+    with metrics.span("image_description"):
+        st.image(get_image_cache().get_or_url(image_url, "description"), width=400)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("**Description A**")
+        st.write(descriptions[0][1])
+    with col2:
+        st.markdown("**Description B**")
+        st.write(descriptions[1][1])
+
+    choice = st.radio(
+        f"Which description would you include for '{title}'?",
+        ["Description A", "Description B"],
+        key=f"preference_{artwork_id}"
+    )
+
+    preference = {
+        "artwork_title": title,
+        "user_choice": choice,
+        "description_A_source": descriptions[0][2],
+        "description_B_source": descriptions[1][2]
+    }
+    if st.session_state.preferences.get(artwork_id) != preference:
+        st.session_state.preferences[artwork_id] = preference
+        checkpoint(entries={"preferences": {artwork_id: preference}})
 
 # Main App Logic
 if st.session_state.user_code and len(st.session_state.user_code) == 4:
     
     
     if st.session_state.index < len(st.session_state.selected_indices):
-        artwork = data.iloc[st.session_state.selected_indices[st.session_state.index]]
-
-        st.image(artwork['image_url'], use_container_width=True)
-        st.subheader(artwork['title'])
+        artwork = catalog[st.session_state.selected_indices[st.session_state.index]]
+
+        # Waits briefly for a prefetch in flight; a cold or unreachable image
+        # falls back to its URL and is cached in the background
+        with metrics.span("image_full"):
+            image = get_image_cache().get_or_url(artwork.image_url, "full")
+        st.image(image, use_container_width=True)
+        st.subheader(artwork.title)
         st.caption(f"Artist: {artwork.get('artist', 'Unknown')}")
 
-        description_text = artwork['description'] if st.session_state.group == "curator" else artwork.get('ai_story', None)
+        description_text = artwork.description if st.session_state.group == "curator" else artwork.get('ai_story', None)
         st.write(description_text if description_text else "No description available for this artwork.")
 
-        if artwork['id'] not in st.session_state.start_times:
-            st.session_state.start_times[artwork['id']] = time.time()
+        # Timing starts once the image is resolved, so waiting for it never counts as dwell time
+        if artwork.id not in st.session_state.start_times:
+            st.session_state.start_times[artwork.id] = time.time()
+            checkpoint(entries={"start_times": {artwork.id: st.session_state.start_times[artwork.id]}})
 
-        if st.button("Next", key=f"next_{artwork['id']}"):
+        prefetch_upcoming()
+
+        if st.button("Next", key=f"next_{artwork.id}"):
             end_time = time.time()
-            time_spent = end_time - st.session_state.start_times[artwork['id']]
+            time_spent = end_time - st.session_state.start_times[artwork.id]
 
-            st.session_state.viewed_items.append({
-                "artwork_id": artwork['id'],
-                "title": artwork['title'],
+            view = {
+                "artwork_id": artwork.id,
+                "title": artwork.title,
                 "time_spent_seconds": round(time_spent, 2),
                 "group": st.session_state.group
-            })
+            }
+            st.session_state.viewed_items.append(view)
 
             st.session_state.index += 1
+            checkpoint(fields={"index": st.session_state.index},
+                       items={"viewed_items": {len(st.session_state.viewed_items) - 1: view}})
             st.rerun()
 
     else:
@@ -340,20 +482,10 @@ if st.session_state.user_code and len(st.session_state.user_code) == 4:
         )
 
         if proceed == "Yes, I want to build an exhibition":
-            viewed_df = pd.DataFrame(st.session_state.viewed_items)
-            selected_titles = []
-
             if st.session_state.exhibition_stage == "select_artworks":
                 st.markdown("#### Select artworks to include in your exhibition:")
-                col_left, col_right = st.columns(2)
-                for i, row in enumerate(viewed_df.itertuples()):
-                    col = col_left if i % 2 == 0 else col_right
-                    with col:
-                        st.markdown("**Select**")
-                        if st.checkbox("select", key=f"select_{row.artwork_id}_{i}", label_visibility="collapsed"):
-                            selected_titles.append(row.artwork_id)
-                        st.image(data[data['id'] == row.artwork_id].iloc[0]['image_url'], width=160)
-                        st.caption(row.title)
+                artwork_picker()
+                selected_titles = list(st.session_state.picked_artworks)
 
                 if st.button("Save My Exhibition and Pick Descriptions for Artworks", key="save_exhibition"):
                     if not selected_titles:
@@ -361,48 +493,14 @@ if st.session_state.user_code and len(st.session_state.user_code) == 4:
                     else:
                         st.session_state.exhibition_stage = "pick_descriptions"
                         st.session_state.selected_titles = selected_titles
+                        checkpoint(fields={"exhibition_stage": "pick_descriptions", "selected_titles": selected_titles})
                         st.rerun()
 
             elif st.session_state.exhibition_stage == "pick_descriptions":
                 selected_titles = st.session_state.selected_titles
                 st.success("Artworks selected. Now select which description you'd include for each artwork.")
                 for artwork_id in selected_titles:
-                    artwork_row = data[data['id'] == artwork_id].iloc[0]
-                    title = artwork_row['title']
-                    image_url = artwork_row['image_url']
-                    curator_desc = artwork_row['description'] or "No curator description available."
-                    ai_desc = artwork_row['ai_story'] or "No AI-generated description available."
-
-                    desc_key = f"description_order_{artwork_id}"
-                    if desc_key not in st.session_state:
-                        descriptions = [("A", curator_desc, "curator"), ("B", ai_desc, "ai")]
-                        random.shuffle(descriptions)
-                        st.session_state[desc_key] = descriptions
-                    else:
-                        descriptions = st.session_state[desc_key]
-
-                    st.markdown(f"### {title}")
-                    st.image(image_url, width=400)
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.markdown("**Description A**")
-                        st.write(descriptions[0][1])
-                    with col2:
-                        st.markdown("**Description B**")
-                        st.write(descriptions[1][1])
-
-                    choice = st.radio(
-                        f"Which description would you include for '{title}'?",
-                        ["Description A", "Description B"],
-                        key=f"preference_{artwork_id}"
-                    )
-
-                    st.session_state.preferences[artwork_id] = {
-                        "artwork_title": title,
-                        "user_choice": choice,
-                        "description_A_source": descriptions[0][2],
-                        "description_B_source": descriptions[1][2]
-                    }
+                    description_choice(artwork_id)
 
                 st.markdown("---")
                 st.subheader("Finalize Your Exhibition")
@@ -420,10 +518,15 @@ if st.session_state.user_code and len(st.session_state.user_code) == 4:
                             "exhibition_description": st.session_state.exhibition_description,
                             "preferences": st.session_state.preferences
                         }
+                        checkpoint(fields={
+                            "curated_exhibition": st.session_state.curated_exhibition,
+                            "exhibition_title": st.session_state.exhibition_title,
+                            "exhibition_description": st.session_state.exhibition_description
+                        })
                         st.success("Your exhibition has been saved!")
 
                         # Write data to Google Sheets immediately
-                        if client and not st.session_state.written_to_sheets:
+                        if not st.session_state.written_to_sheets:
                             write_data_to_sheets()
 
                         st.markdown("---")
@@ -435,7 +538,7 @@ if st.session_state.user_code and len(st.session_state.user_code) == 4:
             st.info("You chose to skip Curator Mode.")
             
             # Write data to Google Sheets even if skipping
-            if client and not st.session_state.written_to_sheets:
+            if not st.session_state.written_to_sheets:
                 write_data_to_sheets()
 
             st.markdown("---")
@@ -443,54 +546,124 @@ if st.session_state.user_code and len(st.session_state.user_code) == 4:
             st.write("Please continue to the final part here:")
             st.markdown("[Go to Survey](https://docs.google.com/forms/d/e/1FAIpQLSfMmbXk8-9qoEygXBqcBY2gAqiGrzDms48tcf0j_ax-px56pg/viewform?usp=header)")
 
+# Download Artifacts
+def exhibition_key(exhibition, viewed_items=None):
+    """Content hash identifying one exhibition's download artifacts"""
+    payload = json.dumps({
+        "title": exhibition.get("exhibition_title", ""),
+        "description": exhibition.get("exhibition_description", ""),
+        "selected_ids": exhibition.get("selected_ids", []),
+        "preferences": exhibition.get("preferences", {}),
+        "viewed_items": viewed_items,
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+# PDF Rendering Jobs
+@st.cache_resource
+def get_pdf_jobs():
+    """Process pool shared by all sessions; each exhibition is rendered once"""
+    max_workers = int(os.environ.get("DIGITALMUSEUM_PDF_WORKERS", "0")) or None
+    return JobQueue(max_workers=max_workers, max_pending=int(os.environ.get("DIGITALMUSEUM_PDF_QUEUE", "32")))
+
+def submit_exhibition_pdf(key, exhibition):
+    """Render job for the exhibition card, queued in a worker process on first request"""
+    jobs = get_pdf_jobs()
+    job = jobs.get(key)
+    if job is None:
+        job = jobs.submit(
+            key,
+            generate_exhibition_pdf,
+            exhibition['exhibition_title'],
+            exhibition['exhibition_description'],
+            exhibition_pages(exhibition['selected_ids'], catalog, exhibition['preferences']),
+            cache_root=get_image_cache().root,
+        )
+    return job
+
+# Poll on a timer without rerunning the rest of the page; older Streamlit
+# versions fall back to a button
+@fragment(run_every=1)
+def show_pdf_pending(key):
+    """Placeholder shown while the card renders; reruns the page once it is ready or failed"""
+    job = get_pdf_jobs().get(key)
+    if job is None or job.done():
+        st.rerun()
+    st.info("Preparing your exhibition card...")
+
+# Arguments starting with an underscore are not hashed by st.cache_data, so
+# each artifact is cached under its content key only
+@st.cache_data(max_entries=256, show_spinner=False)
+def build_views_csv(key, _viewed_items, user_code, timestamp):
+    """Artwork views CSV bytes"""
+    df_views = pd.DataFrame(_viewed_items)
+    if df_views.empty:
+        return None
+    df_views["user_code"] = user_code
+    df_views["timestamp"] = timestamp
+    return df_views.to_csv(index=False).encode('utf-8')
+
+@st.cache_data(max_entries=256, show_spinner=False)
+def build_summary_csv(key, _exhibition):
+    """Exhibition summary CSV bytes"""
+    df_summary = pd.DataFrame([{
+        "exhibition_title": _exhibition.get("exhibition_title", ""),
+        "exhibition_description": _exhibition.get("exhibition_description", ""),
+        "selected_ids": ", ".join(_exhibition.get("selected_ids", [])),
+        "preferences": json.dumps(_exhibition.get("preferences", {}), indent=2)
+    }])
+    return df_summary.to_csv(index=False).encode('utf-8')
+
 # Downloads if Exhibition Was Created
 if "curated_exhibition" in st.session_state:
     exhibition = st.session_state.curated_exhibition
+    key = exhibition_key(exhibition)
 
     st.markdown("---")
     st.subheader("Download Your Exhibition Card (PDF)")
-    
-    try:
-        pdf_buffer = generate_exhibition_pdf(
-            title=exhibition['exhibition_title'],
-            description=exhibition['exhibition_description'],
-            artwork_ids=exhibition['selected_ids'],
-            data=data,
-            preferences=exhibition['preferences']
-        )
 
-        st.download_button(
-            label="Download Exhibition Card (PDF)",
-            data=pdf_buffer,
-            file_name="my_exhibition_card.pdf",
-            mime="application/pdf"
-        )
-    except Exception as e:
-        st.error(f"Error generating PDF: {e}")
+    # The PDF is only rendered once the participant asks for it
+    if st.session_state.get("pdf_requested") != key:
+        if st.button("Prepare Exhibition Card (PDF)", key="prepare_pdf"):
+            st.session_state.pdf_requested = key
+            st.rerun()
+    else:
+        try:
+            job = submit_exhibition_pdf(key, exhibition)
+            if job.done():
+                st.download_button(
+                    label="Download Exhibition Card (PDF)",
+                    data=job.result(),
+                    file_name="my_exhibition_card.pdf",
+                    mime="application/pdf"
+                )
+            else:
+                show_pdf_pending(key)
+                if not HAS_FRAGMENTS and st.button("Check again", key="check_pdf"):
+                    st.rerun()
+        except QueueFull:
+            st.warning("Many exhibition cards are being prepared right now. Please try again in a moment.")
+            if st.button("Try again", key="retry_pdf"):
+                st.rerun()
+        except Exception as e:
+            # Stop polling; the participant can ask for the card again
+            st.session_state.pdf_requested = None
+            st.error(f"Error generating PDF: {e}")
 
     # CSV downloads
-    df_views = pd.DataFrame(st.session_state.viewed_items)
-    if not df_views.empty:
-        df_views["user_code"] = st.session_state.user_code
-        df_views["timestamp"] = time.strftime("%Y-%m-%d %H:%M:%S")
-        
+    timestamp = st.session_state.get("completed_at") or time.strftime("%Y-%m-%d %H:%M:%S")
+    views_key = exhibition_key(exhibition, st.session_state.viewed_items)
+    views_csv = build_views_csv(views_key, st.session_state.viewed_items, st.session_state.user_code, timestamp)
+    if views_csv is not None:
         st.download_button(
             label="Download Artwork Views (CSV)",
-            data=df_views.to_csv(index=False).encode('utf-8'),
+            data=views_csv,
             file_name="artwork_views.csv",
             mime="text/csv"
         )
 
-    df_summary = pd.DataFrame([{
-        "exhibition_title": exhibition.get("exhibition_title", ""),
-        "exhibition_description": exhibition.get("exhibition_description", ""),
-        "selected_ids": ", ".join(exhibition.get("selected_ids", [])),
-        "preferences": json.dumps(exhibition.get("preferences", {}), indent=2)
-    }])
-
     st.download_button(
         label="Download Exhibition Summary (CSV)",
-        data=df_summary.to_csv(index=False).encode('utf-8'),
+        data=build_summary_csv(key, exhibition),
         file_name="exhibition_summary.csv",
         mime="text/csv"
     )
@@ -498,3 +671,6 @@ if "curated_exhibition" in st.session_state:
 # Show user code prompt if not provided 
 if not st.session_state.user_code or len(st.session_state.user_code) != 4:
     st.write("Please enter your 4-letter participant code to continue.")
+
+# Reruns cut short by st.rerun() or st.stop() are not counted
+metrics.observe("rerun", time.perf_counter() - rerun_started)
@@ -0,0 +1,85 @@
+"""Compare catalog startup time and memory: metadata JSON vs. compiled SQLite store
+
+Generates a synthetic collection of the requested size from the bundled
+metadata, compiles it, then loads the catalog both ways in fresh
+subprocesses and reports wall time and peak RSS.
+
+    python benchmarks/bench_catalog_load.py --sizes 1000 10000 50000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SOURCE = os.path.join(ROOT, "data", "real_museum_metadata_with_ai.json")
+
+# Runs in a fresh interpreter so imports and peak RSS are measured per path
+PROBE = """
+import resource, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+import catalog_store
+if {mode!r} == "json":
+    import pandas as pd
+    from catalog import ArtworkCatalog
+    catalog = ArtworkCatalog.from_dataframe(pd.read_json({json_path!r}))
+else:
+    catalog = catalog_store.load_catalog({json_path!r}, {db_path!r})
+elapsed = time.perf_counter() - start
+# Touch one artwork's text the way the viewing page does
+catalog[len(catalog) // 2].description
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(elapsed, rss_kb, len(catalog))
+"""
+
+
+def make_collection(size, path):
+    with open(SOURCE, encoding="utf-8") as f:
+        base = json.load(f)
+    records = []
+    for i in range(size):
+        record = dict(base[i % len(base)])
+        record["id"] = f"{record['id']}-{i}"
+        records.append(record)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(records, f)
+
+
+def probe(mode, json_path, db_path, repeat):
+    script = PROBE.format(root=ROOT, mode=mode, json_path=json_path, db_path=db_path)
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True).stdout
+        elapsed, rss_kb, count = out.split()
+        runs.append((float(elapsed), int(rss_kb)))
+    best = min(runs)
+    return best[0], max(rss for _, rss in runs) / 1024
+
+
+def main(argv=None):
+    import catalog_store
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'artworks':>9} {'path':>6} {'startup (s)':>12} {'peak RSS (MB)':>14}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            json_path = os.path.join(tmp, f"metadata_{size}.json")
+            db_path = os.path.join(tmp, f"catalog_{size}.sqlite3")
+            make_collection(size, json_path)
+            catalog_store.build(json_path, db_path)
+            for mode in ("json", "sqlite"):
+                elapsed, rss_mb = probe(mode, json_path, db_path, args.repeat)
+                print(f"{size:>9} {mode:>6} {elapsed:>12.3f} {rss_mb:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""Headless load test: N simulated participants driving the real app.py
+
+Each participant runs the full flow through Streamlit's AppTest: enter a
+code, click "Next" through every artwork, select artworks, pick
+descriptions, save the exhibition and prepare the PDF download. Google
+Sheets and the image host are replaced by the local fakes in fakes.py with
+configurable latency. Exhibition cards render in spawned worker processes,
+which the fakes cannot reach, so the images of each exhibition are put in
+the shared image cache before its card is requested.
+
+Reports p50/p95/p99 rerun latency per stage, Sheets API call counts and
+peak memory.
+
+    python benchmarks/bench_load.py --participants 100 --concurrency 20 --sheets-latency 0.2
+"""
+import argparse
+import os
+import random
+import resource
+import string
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+import catalog_store
+import fakes
+import image_cache
+import metrics
+from outbox import Outbox, PENDING, SPREADSHEET_NAME, SUMMARY_SHEET, UNCONFIRMED, VIEWS_SHEET
+
+APP_PATH = os.path.join(ROOT, "app.py")
+STAGES = ["start", "enter_code", "next", "select", "save_selection", "pick_description", "finalize", "prepare_pdf", "pdf_poll"]
+
+
+def percentile(values, q):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Recorder:
+    def __init__(self):
+        self.timings = {stage: [] for stage in STAGES}
+        self.errors = []
+        self._lock = threading.Lock()
+
+    def run(self, stage, element):
+        start = time.perf_counter()
+        at = element.run()
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.timings[stage].append(elapsed)
+        if at.exception:
+            raise RuntimeError(f"{stage}: {at.exception[0].value}")
+        return at
+
+
+def button(at, key_prefix):
+    return next(b for b in at.button if b.key and b.key.startswith(key_prefix))
+
+
+def participant(recorder, code, select_count, timeout, seed_pdf_images):
+    at = AppTest.from_file(APP_PATH, default_timeout=timeout)
+    at.secrets["gspread"] = {"type": "service_account"}
+    at = recorder.run("start", at)
+    at = recorder.run("enter_code", at.text_input[0].input(code))
+
+    for _ in range(len(at.session_state["selected_indices"])):
+        at = recorder.run("next", button(at, "next_").click())
+
+    checkboxes = [c for c in at.checkbox if c.key and c.key.startswith("select_")]
+    for checkbox in checkboxes[:select_count]:
+        at = recorder.run("select", checkbox.check())
+    at = recorder.run("save_selection", button(at, "save_exhibition").click())
+
+    for radio in [r for r in at.radio if r.key and r.key.startswith("preference_")]:
+        at = recorder.run("pick_description", radio.set_value(random.choice(["Description A", "Description B"])))
+
+    at.text_input(key="exhibition_title_input").input(f"Exhibition {code}")
+    at.text_area(key="exhibition_description_input").input("A load-test exhibition.")
+    at = recorder.run("finalize", button(at, "finalize_exhibition").click())
+    seed_pdf_images(at.session_state["curated_exhibition"]["selected_ids"])
+    at = recorder.run("prepare_pdf", button(at, "prepare_pdf").click())
+
+    # The card renders in a worker process; rerun the way the polling fragment would
+    deadline = time.time() + timeout
+    while not at.get("download_button"):
+        if time.time() >= deadline:
+            raise RuntimeError(f"pdf_poll: exhibition card not ready after {timeout:.0f}s")
+        time.sleep(0.2)
+        at = recorder.run("pdf_poll", at)
+
+
+def sheets_calls(client, spreadsheet):
+    calls = dict(client.calls)
+    for name, count in spreadsheet.calls.items():
+        calls[name] = calls.get(name, 0) + count
+    for worksheet in spreadsheet._worksheets.values():
+        for name, count in worksheet.calls.items():
+            calls[name] = calls.get(name, 0) + count
+    return calls
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent participants against app.py")
+    parser.add_argument("--participants", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=5)
+    parser.add_argument("--select", type=int, default=4, help="artworks each participant puts in the exhibition")
+    parser.add_argument("--sheets-latency", type=float, default=0.1, help="seconds per fake Sheets API call")
+    parser.add_argument("--image-latency", type=float, default=0.05, help="seconds per fake image download")
+    parser.add_argument("--drain-timeout", type=float, default=60.0)
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds allowed per rerun")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--metrics", metavar="PATH", help="also write the app's per-stage metrics (Prometheus text) here")
+    args = parser.parse_args(argv)
+
+    random.seed(args.seed)
+    state_dir = tempfile.mkdtemp(prefix="digitalmuseum-load-")
+    os.environ["DIGITALMUSEUM_OUTBOX"] = os.path.join(state_dir, "outbox.sqlite3")
+    os.environ["DIGITALMUSEUM_IMAGE_CACHE"] = os.path.join(state_dir, "images")
+    os.environ["DIGITALMUSEUM_CHECKPOINTS"] = os.path.join(state_dir, "checkpoints.sqlite3")
+    if args.metrics:
+        os.environ["DIGITALMUSEUM_METRICS"] = "1"
+        metrics.reset()
+
+    spreadsheet = fakes.FakeSpreadsheet(SPREADSHEET_NAME, [VIEWS_SHEET, SUMMARY_SHEET],
+                                        latency=args.sheets_latency)
+    client = fakes.FakeClient([spreadsheet], latency=args.sheets_latency)
+    images = fakes.FakeImageSession(latency=args.image_latency)
+    catalog = catalog_store.load_catalog()
+    pdf_images = image_cache.ImageCache(os.environ["DIGITALMUSEUM_IMAGE_CACHE"], session=images)
+
+    def seed_pdf_images(artwork_ids):
+        pdf_images.get_many([catalog.get(artwork_id).image_url for artwork_id in artwork_ids
+                             if artwork_id in catalog], "pdf")
+    codes = ["".join(random.choices(string.ascii_uppercase, k=4)) for _ in range(args.participants)]
+
+    st.cache_data.clear()
+    st.cache_resource.clear()
+    recorder = Recorder()
+    tracemalloc.start()
+    started = time.perf_counter()
+    with mock.patch("gspread.authorize", return_value=client), \
+            mock.patch("google.oauth2.service_account.Credentials.from_service_account_info"), \
+            mock.patch.object(image_cache, "make_session", return_value=images):
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            futures = [pool.submit(participant, recorder, code, args.select, args.timeout, seed_pdf_images) for code in codes]
+            for future in futures:
+                try:
+                    future.result()
+                except Exception as e:
+                    recorder.errors.append(e)
+        wall = time.perf_counter() - started
+
+        # Telemetry is shipped in the background; wait for the outbox to empty
+        outbox = Outbox(os.environ["DIGITALMUSEUM_OUTBOX"], readonly=True)
+        deadline = time.time() + args.drain_timeout
+        counts = {}
+        while time.time() < deadline:
+            counts = outbox.counts()
+            if not counts.get(PENDING) and not counts.get(UNCONFIRMED) and not counts.get("sending"):
+                break
+            time.sleep(0.5)
+        else:
+            recorder.errors.append(RuntimeError(f"outbox not drained after {args.drain_timeout:.0f}s: {counts}"))
+        drained = time.perf_counter() - started
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f"{args.participants} participants, concurrency {args.concurrency}, "
+          f"{wall:.1f}s wall ({drained:.1f}s until the outbox drained)")
+    print(f"\n{'stage':<18}{'reruns':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for stage in STAGES:
+        values = [v * 1000 for v in recorder.timings[stage]]
+        if values:
+            print(f"{stage:<18}{len(values):>8}{percentile(values, 50):>10.1f}{percentile(values, 95):>10.1f}"
+                  f"{percentile(values, 99):>10.1f}{max(values):>10.1f}")
+
+    calls = sheets_calls(client, spreadsheet)
+    print(f"\nSheets API calls: {sum(calls.values())} " + " ".join(f"{k}={v}" for k, v in sorted(calls.items())))
+    print(f"Outbox: {outbox.counts()}")
+    views = spreadsheet._worksheets[VIEWS_SHEET].rows
+    summaries = spreadsheet._worksheets[SUMMARY_SHEET].rows
+    print(f"Rows written: {max(0, len(views) - 1)} views, {max(0, len(summaries) - 1)} summaries")
+    print(f"Image downloads: {len(images.requests)} ({images.bytes_served / 1e6:.1f} MB)")
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"Peak memory: {peak_traced / 1e6:.1f} MB traced Python allocations, {peak_rss_mb:.1f} MB RSS")
+    if args.metrics:
+        metrics.write(args.metrics)
+        print(f"Metrics written to {args.metrics}")
+    if recorder.errors:
+        print(f"\n{len(recorder.errors)} errors; first error: {recorder.errors[0]!r}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
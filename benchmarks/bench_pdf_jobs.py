@@ -0,0 +1,99 @@
+"""Exhibition card throughput per worker count, and rerun latency while rendering
+
+Renders a batch of synthetic exhibitions through JobQueue with 1..N worker
+processes and reports cards per second. While each batch renders, the
+main thread repeatedly runs a small stand-in for an interactive rerun
+(catalog lookups plus JSON encoding) and reports its p50/p95 latency,
+which should stay close to the idle figure whatever the worker count.
+
+    python benchmarks/bench_pdf_jobs.py --exhibitions 64 --artworks 8 --workers 1 2 4
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import catalog_store
+import fakes
+from exhibition_pdf import exhibition_pages, generate_exhibition_pdf
+from image_cache import ImageCache
+from pdf_jobs import JobQueue
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * (len(ordered) - 1))))]
+
+
+def make_exhibitions(catalog, count, size):
+    ids = catalog.ids()
+    exhibitions = []
+    for i in range(count):
+        selected = [ids[(i + j) % len(ids)] for j in range(size)]
+        preferences = {aid: {"user_choice": "Description A" if (i + j) % 2 else "Description B",
+                             "description_A_source": "curator", "description_B_source": "ai"}
+                       for j, aid in enumerate(selected)}
+        exhibitions.append((f"Exhibition {i}", "A synthetic exhibition for benchmarking.",
+                            exhibition_pages(selected, catalog, preferences)))
+    return exhibitions
+
+
+def simulated_rerun(catalog):
+    start = time.perf_counter()
+    for position in range(0, len(catalog), max(1, len(catalog) // 16)):
+        artwork = catalog[position]
+        json.dumps(artwork.to_dict())
+    return time.perf_counter() - start
+
+
+def run(exhibitions, workers, catalog, cache_root):
+    queue = JobQueue(max_workers=workers, max_pending=len(exhibitions))
+    # Start the worker processes before timing
+    queue.submit("warmup", generate_exhibition_pdf, "warmup", "", [], cache_root=cache_root).result()
+
+    latencies = []
+    start = time.perf_counter()
+    jobs = [queue.submit(i, generate_exhibition_pdf, title, description, pages, cache_root=cache_root)
+            for i, (title, description, pages) in enumerate(exhibitions)]
+    while not all(job.done() for job in jobs):
+        latencies.append(simulated_rerun(catalog))
+        time.sleep(0.005)
+    elapsed = time.perf_counter() - start
+    size = sum(len(job.result()) for job in jobs)
+    queue.shutdown()
+    return elapsed, size, latencies
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--exhibitions", type=int, default=32)
+    parser.add_argument("--artworks", type=int, default=6, help="artworks per exhibition")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, os.cpu_count() or 1}))
+    args = parser.parse_args(argv)
+
+    catalog = catalog_store.load_catalog()
+    exhibitions = make_exhibitions(catalog, args.exhibitions, args.artworks)
+    idle = [simulated_rerun(catalog) for _ in range(200)]
+    print(f"{os.cpu_count()} CPUs; idle rerun p50 {percentile(idle, 50) * 1000:.2f} ms, "
+          f"p95 {percentile(idle, 95) * 1000:.2f} ms")
+
+    with tempfile.TemporaryDirectory() as cache_root:
+        # Seed the shared image cache so workers measure rendering, not downloads
+        cache = ImageCache(cache_root, session=fakes.FakeImageSession())
+        cache.get_many([page["image_url"] for _, _, pages in exhibitions for page in pages], "pdf")
+
+        print(f"\n{'workers':>7} {'seconds':>8} {'cards/s':>8} {'MB':>7} {'rerun p50 ms':>13} {'rerun p95 ms':>13}")
+        for workers in args.workers:
+            elapsed, size, latencies = run(exhibitions, workers, catalog, cache_root)
+            latencies = latencies or [0.0]
+            print(f"{workers:>7} {elapsed:>8.2f} {len(exhibitions) / elapsed:>8.1f} {size / 1e6:>7.1f} "
+                  f"{percentile(latencies, 50) * 1000:>13.2f} {percentile(latencies, 95) * 1000:>13.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""Id-indexed, in-memory artwork catalog
+
+Built once from the museum metadata so that every lookup in the app is a
+dict access (by id) or a list access (by position in `selected_indices`)
+instead of a pandas boolean-mask scan over the whole collection.
+"""
+import math
+
+SUMMARY_FIELDS = ("id", "title", "artist", "longTitle", "image_url", "theme")
+TEXT_FIELDS = ("description", "ai_story")
+FIELDS = SUMMARY_FIELDS + TEXT_FIELDS
+
+
+def _clean(value):
+    # pandas represents missing values as NaN; the app expects None
+    if isinstance(value, float) and math.isnan(value):
+        return None
+    return value
+
+
+class Artwork:
+    """Compact record for a single artwork
+
+    The long text fields are either given up front or fetched on first
+    access through `load_texts(id)`, which returns a dict of TEXT_FIELDS.
+    """
+    __slots__ = SUMMARY_FIELDS + ("_texts", "_load_texts")
+
+    def __init__(self, load_texts=None, **fields):
+        for name in SUMMARY_FIELDS:
+            setattr(self, name, _clean(fields.get(name)))
+        if load_texts is None or any(name in fields for name in TEXT_FIELDS):
+            self._texts = {name: _clean(fields.get(name)) for name in TEXT_FIELDS}
+        else:
+            self._texts = None
+        self._load_texts = load_texts
+
+    def _text(self, name):
+        if self._texts is None:
+            self._texts = {name: _clean(value) for name, value in self._load_texts(self.id).items()}
+        return self._texts.get(name)
+
+    @property
+    def description(self):
+        return self._text("description")
+
+    @property
+    def ai_story(self):
+        return self._text("ai_story")
+
+    def get(self, name, default=None):
+        """Field value, or `default` when the field is missing or empty"""
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in FIELDS}
+
+    def __repr__(self):
+        return f"Artwork(id={self.id!r}, title={self.title!r})"
+
+
+class ArtworkCatalog:
+    """Artworks in load order, with O(1) access by position and by id"""
+
+    def __init__(self, artworks):
+        self._artworks = list(artworks)
+        self._by_id = {artwork.id: position for position, artwork in enumerate(self._artworks)}
+
+    @classmethod
+    def from_records(cls, records, load_texts=None):
+        return cls(Artwork(load_texts, **record) for record in records)
+
+    @classmethod
+    def from_dataframe(cls, df, load_texts=None):
+        columns = [name for name in FIELDS if name in df.columns]
+        return cls(
+            Artwork(load_texts, **dict(zip(columns, values)))
+            for values in df[columns].itertuples(index=False, name=None)
+        )
+
+    def __len__(self):
+        return len(self._artworks)
+
+    def __iter__(self):
+        return iter(self._artworks)
+
+    def __getitem__(self, position):
+        return self._artworks[position]
+
+    def __contains__(self, artwork_id):
+        return artwork_id in self._by_id
+
+    def get(self, artwork_id):
+        """Artwork with the given id; raises KeyError if it is not in the catalog"""
+        return self._artworks[self._by_id[artwork_id]]
+
+    def position(self, artwork_id):
+        """Index of an artwork, as used in `selected_indices`"""
+        return self._by_id[artwork_id]
+
+    def ids(self):
+        return list(self._by_id)
@@ -0,0 +1,172 @@
+"""Compiled SQLite catalog for fast startup
+
+`python catalog_store.py build` converts the metadata JSON into a SQLite
+file with two tables: the small per-artwork fields, loaded eagerly at
+startup, and the long `description`/`ai_story` texts, which are read by id
+only when an artwork is actually shown. The app falls back to parsing the
+JSON whenever the compiled store is missing or out of date.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from urllib.request import pathname2url
+
+import pandas as pd
+
+from catalog import ArtworkCatalog, SUMMARY_FIELDS, TEXT_FIELDS
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_JSON = os.path.join(DATA_DIR, "real_museum_metadata_with_ai.json")
+DEFAULT_DB = os.path.join(DATA_DIR, "catalog.sqlite3")
+
+SCHEMA = """
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE artworks (
+    position INTEGER PRIMARY KEY,
+    id TEXT NOT NULL UNIQUE,
+    title TEXT, artist TEXT, longTitle TEXT, image_url TEXT, theme TEXT
+);
+CREATE TABLE texts (id TEXT PRIMARY KEY, description TEXT, ai_story TEXT) WITHOUT ROWID;
+"""
+
+
+def _file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_fingerprint(path):
+    stat = os.stat(path)
+    return {"size": str(stat.st_size), "mtime_ns": str(stat.st_mtime_ns)}
+
+
+def build(json_path=DEFAULT_JSON, db_path=DEFAULT_DB):
+    """Compile the metadata JSON into a SQLite catalog; returns the number of artworks"""
+    with open(json_path, encoding="utf-8") as f:
+        records = json.load(f)
+
+    tmp_path = db_path + ".tmp"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    conn = sqlite3.connect(tmp_path)
+    try:
+        conn.executescript(SCHEMA)
+        conn.executemany(
+            f"INSERT INTO artworks (position, {', '.join(SUMMARY_FIELDS)}) VALUES (?, {', '.join('?' * len(SUMMARY_FIELDS))})",
+            [(position, *(record.get(name) for name in SUMMARY_FIELDS)) for position, record in enumerate(records)],
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO texts (id, description, ai_story) VALUES (?, ?, ?)",
+            [(record["id"], record.get("description"), record.get("ai_story")) for record in records],
+        )
+        meta = {"source_sha256": _file_sha256(json_path), **_source_fingerprint(json_path)}
+        conn.executemany("INSERT INTO meta (key, value) VALUES (?, ?)", meta.items())
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(tmp_path, db_path)
+    return len(records)
+
+
+class CatalogStore:
+    """Read-only access to a compiled catalog"""
+
+    def __init__(self, db_path=DEFAULT_DB):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro", uri=True,
+                                     check_same_thread=False)
+
+    def meta(self):
+        with self._lock:
+            return dict(self._conn.execute("SELECT key, value FROM meta").fetchall())
+
+    def is_fresh(self, json_path):
+        """Whether the store was compiled from the current contents of `json_path`"""
+        meta = self.meta()
+        if not os.path.exists(json_path):
+            return True
+        if _source_fingerprint(json_path) == {"size": meta.get("size"), "mtime_ns": meta.get("mtime_ns")}:
+            return True
+        # A fresh checkout changes mtimes without changing content
+        return meta.get("source_sha256") == _file_sha256(json_path)
+
+    def summary_frame(self):
+        """Small per-artwork fields, in catalog order"""
+        with self._lock:
+            return pd.read_sql_query(f"SELECT {', '.join(SUMMARY_FIELDS)} FROM artworks ORDER BY position", self._conn)
+
+    def frame(self):
+        """All fields, equivalent to reading the metadata JSON"""
+        columns = ", ".join([f"a.{name}" for name in SUMMARY_FIELDS] + [f"t.{name}" for name in TEXT_FIELDS])
+        with self._lock:
+            return pd.read_sql_query(
+                f"SELECT {columns} FROM artworks a LEFT JOIN texts t ON t.id = a.id ORDER BY a.position",
+                self._conn,
+            )
+
+    def texts(self, artwork_id):
+        """Long text fields of one artwork"""
+        with self._lock:
+            row = self._conn.execute("SELECT description, ai_story FROM texts WHERE id = ?", (artwork_id,)).fetchone()
+        return dict(zip(TEXT_FIELDS, row)) if row else {}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def open_store(json_path=DEFAULT_JSON, db_path=DEFAULT_DB):
+    """The compiled store for `json_path`, or None if it is missing or stale"""
+    if not os.path.exists(db_path):
+        return None
+    try:
+        store = CatalogStore(db_path)
+        if store.is_fresh(json_path):
+            return store
+        store.close()
+    except sqlite3.Error:
+        pass
+    return None
+
+
+def load_museum_data(json_path=DEFAULT_JSON, db_path=DEFAULT_DB):
+    """Full metadata DataFrame, read from the compiled store when it is up to date"""
+    store = open_store(json_path, db_path)
+    if store is None:
+        return pd.read_json(json_path)
+    try:
+        return store.frame()
+    finally:
+        store.close()
+
+
+def load_catalog(json_path=DEFAULT_JSON, db_path=DEFAULT_DB):
+    """ArtworkCatalog with lazily loaded texts when a compiled store is available"""
+    store = open_store(json_path, db_path)
+    if store is None:
+        return ArtworkCatalog.from_dataframe(pd.read_json(json_path))
+    return ArtworkCatalog.from_dataframe(store.summary_frame(), load_texts=store.texts)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compile the museum metadata into a SQLite catalog")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_cmd = commands.add_parser("build", help="compile the metadata JSON")
+    build_cmd.add_argument("--json", default=DEFAULT_JSON)
+    build_cmd.add_argument("--db", default=DEFAULT_DB)
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        count = build(args.json, args.db)
+        print(f"Compiled {count} artworks into '{args.db}'")
+
+
+if __name__ == "__main__":
+    main()
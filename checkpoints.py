@@ -0,0 +1,202 @@
+"""Incremental checkpoints of participant progress, keyed by participant code
+
+Every "Next" click and stage transition records only what changed: a
+single field, one entry of a dict field (e.g. one artwork's start time) or
+one appended list item (e.g. one viewed artwork). Each change is a single
+upsert into a local SQLite database (WAL mode), so a refresh or dropped
+connection can restore the session instead of starting over. Checkpoints
+not touched for `max_age` seconds are deleted by a background thread.
+
+    python checkpoints.py show CODE
+    python checkpoints.py expire --max-age 604800
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "checkpoints.sqlite3")
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+
+# Kinds of stored fields: a whole value, one entry of a dict, one item of a list
+VALUE, ENTRY, ITEM = "value", "entry", "item"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    user_code TEXT NOT NULL,
+    field TEXT NOT NULL,
+    entry TEXT NOT NULL DEFAULT '',
+    kind TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user_code, field, entry)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sessions (
+    user_code TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS sessions_updated ON sessions (updated_at);
+"""
+
+
+class CheckpointStore:
+    """Per-participant progress stored as small upserts"""
+
+    def __init__(self, path=DEFAULT_PATH, max_age=DEFAULT_MAX_AGE, expire_interval=3600):
+        self.path = path
+        self.max_age = max_age
+        self.expire_interval = expire_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # NORMAL skips the fsync per commit; a checkpoint survives a crashed
+        # app process, which is what a refresh or dropped connection needs
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._expire_thread = None
+
+    def update(self, user_code, fields=None, entries=None, items=None):
+        """Record one delta in a single transaction
+
+        `fields` maps field names to whole values, `entries` maps dict fields
+        to {key: value} and `items` maps list fields to {index: value}.
+        """
+        rows = [(field, "", VALUE, value) for field, value in (fields or {}).items()]
+        for field, values in (entries or {}).items():
+            rows.extend((field, str(key), ENTRY, value) for key, value in values.items())
+        for field, values in (items or {}).items():
+            rows.extend((field, f"{index:08d}", ITEM, value) for index, value in values.items())
+        if rows:
+            self._upsert(user_code, rows)
+
+    def _upsert(self, user_code, rows):
+        now = time.time()
+        with metrics.span("checkpoint_write"), self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO checkpoints (user_code, field, entry, kind, value, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    [(user_code, field, entry, kind, json.dumps(value, ensure_ascii=False), now)
+                     for field, entry, kind, value in rows],
+                )
+                self._conn.execute("INSERT OR REPLACE INTO sessions (user_code, updated_at) VALUES (?, ?)",
+                                   (user_code, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        metrics.incr("checkpoint_writes_total")
+
+    def set(self, user_code, **fields):
+        """Store whole field values"""
+        self.update(user_code, fields=fields)
+
+    def put(self, user_code, field, key, value):
+        """Store one entry of a dict field"""
+        self.update(user_code, entries={field: {key: value}})
+
+    def append(self, user_code, field, index, value):
+        """Store the item at position `index` of a list field"""
+        self.update(user_code, items={field: {index: value}})
+
+    def load(self, user_code):
+        """The stored fields of a participant, or None if there is no checkpoint"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT field, entry, kind, value FROM checkpoints WHERE user_code = ? ORDER BY field, entry",
+                (user_code,),
+            ).fetchall()
+        if not rows:
+            return None
+        state = {}
+        for field, entry, kind, value in rows:
+            value = json.loads(value)
+            if kind == ENTRY:
+                state.setdefault(field, {})[entry] = value
+            elif kind == ITEM:
+                state.setdefault(field, []).append(value)
+            else:
+                state[field] = value
+        return state
+
+    def delete(self, user_code):
+        with self._lock:
+            self._conn.execute("DELETE FROM checkpoints WHERE user_code = ?", (user_code,))
+            self._conn.execute("DELETE FROM sessions WHERE user_code = ?", (user_code,))
+
+    def expire(self, max_age=None):
+        """Delete checkpoints not updated for `max_age` seconds; returns the number of participants removed"""
+        cutoff = time.time() - (self.max_age if max_age is None else max_age)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "DELETE FROM checkpoints WHERE user_code IN (SELECT user_code FROM sessions WHERE updated_at < ?)",
+                    (cutoff,),
+                )
+                cursor = self._conn.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return cursor.rowcount
+
+    def start_expiry(self):
+        """Expire old checkpoints in the background every `expire_interval` seconds"""
+        if self._expire_thread is None:
+            self._expire_thread = threading.Thread(target=self._run_expiry, name="checkpoint-expiry", daemon=True)
+            self._expire_thread.start()
+        return self
+
+    def _run_expiry(self):
+        while True:
+            try:
+                removed = self.expire()
+                if removed:
+                    logger.info("Expired checkpoints of %d participants", removed)
+            except Exception as e:
+                logger.error("Checkpoint expiry failed: %s", e)
+            time.sleep(self.expire_interval)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or expire participant checkpoints")
+    parser.add_argument("--db", default=os.environ.get("DIGITALMUSEUM_CHECKPOINTS", DEFAULT_PATH))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    show_cmd = commands.add_parser("show", help="print the stored state of a participant")
+    show_cmd.add_argument("user_code")
+
+    expire_cmd = commands.add_parser("expire", help="delete old checkpoints now")
+    expire_cmd.add_argument("--max-age", type=float, default=DEFAULT_MAX_AGE, help="seconds")
+
+    args = parser.parse_args(argv)
+    store = CheckpointStore(args.db)
+
+    if args.command == "show":
+        state = store.load(args.user_code)
+        if state is None:
+            print(f"No checkpoint for '{args.user_code}'")
+        else:
+            print(json.dumps(state, indent=2, ensure_ascii=False))
+    elif args.command == "expire":
+        print(f"Expired checkpoints of {store.expire(args.max_age)} participants")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""Exhibition card layout, runnable outside the Streamlit script
+
+The app resolves each chosen artwork to a plain `page` dict (title, theme,
+image_url and the description the participant picked) so rendering needs
+neither the catalog nor Streamlit and can run in a worker process. Images
+are read through the shared on-disk ImageCache, so a worker only
+downloads what no other process has cached yet.
+"""
+import io
+import logging
+from textwrap import wrap
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import letter
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from image_cache import DEFAULT_DIR as IMAGE_CACHE_DIR, ImageCache
+
+logger = logging.getLogger(__name__)
+
+_image_caches = {}
+
+
+def chosen_description(artwork, preference):
+    """Text of the description a participant picked for an artwork"""
+    chosen = preference['user_choice']
+    source = preference['description_A_source'] if chosen == 'Description A' else preference['description_B_source']
+    return artwork.description if source == 'curator' else artwork.ai_story
+
+
+def exhibition_pages(artwork_ids, catalog, preferences):
+    """One page dict per artwork that has a recorded preference, in exhibition order"""
+    pages = []
+    for aid in artwork_ids:
+        pref = preferences.get(aid)
+        if not pref or aid not in catalog:
+            continue
+        row = catalog.get(aid)
+        pages.append({
+            "id": aid,
+            "title": row.title,
+            "theme": row.get('theme', 'Unknown'),
+            "image_url": row.image_url,
+            "description": chosen_description(row, pref) or "",
+        })
+    return pages
+
+
+def image_cache(root=IMAGE_CACHE_DIR):
+    """ImageCache for `root`, shared by every render in this process"""
+    cache = _image_caches.get(root)
+    if cache is None:
+        cache = _image_caches[root] = ImageCache(root)
+    return cache
+
+
+def generate_exhibition_pdf(title, description, pages, images=None, cache_root=IMAGE_CACHE_DIR):
+    """PDF bytes of an exhibition card: a cover page, then one page per artwork
+
+    `images` maps image URLs to JPEG bytes (None for failed fetches); any
+    missing ones are fetched in parallel through the image cache.
+    """
+    images = dict(images or {})
+    missing = [page["image_url"] for page in pages if page["image_url"] and page["image_url"] not in images]
+    if missing:
+        images.update(image_cache(cache_root).get_many(missing, "pdf"))
+
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=letter)
+    width, height = letter
+
+    margin = 1 * inch
+    image_width = width - 2 * margin
+    image_height = 4 * inch
+
+    # Cover Page
+    c.setFillColorRGB(1, 1, 1)
+    c.rect(0, 0, width, height, stroke=0, fill=1)
+    c.setFont("Helvetica-Bold", 28)
+    c.setFillColor(colors.HexColor("#2c3e50"))
+    c.drawCentredString(width / 2, height - 2 * inch, title)
+
+    c.setFont("Helvetica", 14)
+    c.setFillColor(colors.HexColor("#333333"))
+    wrapped_intro = wrap(description, width=80)
+    text = c.beginText(margin, height - 2.5 * inch)
+    text.setLeading(18)
+    for line in wrapped_intro:
+        text.textLine(line)
+    c.drawText(text)
+    c.showPage()
+
+    for page in pages:
+        try:
+            c.setFillColorRGB(1, 1, 1)
+            c.rect(0, 0, width, height, stroke=0, fill=1)
+
+            c.setFont("Helvetica-Bold", 18)
+            c.setFillColor(colors.HexColor("#2c3e50"))
+            c.drawCentredString(width / 2, height - 1 * inch, page["title"])
+
+            c.setFont("Helvetica", 12)
+            c.setFillColor(colors.HexColor("#7f8c8d"))
+            c.drawCentredString(width / 2, height - 1.3 * inch, f"Theme: {page['theme']}")
+
+            y = height - 2 * inch
+
+            try:
+                img_bytes = images.get(page["image_url"])
+                if img_bytes is None:
+                    raise Exception("Image fetch failed")
+                c.drawImage(ImageReader(io.BytesIO(img_bytes)), margin, y - image_height, width=image_width, height=image_height, preserveAspectRatio=True, anchor='n', mask='auto')
+                y -= image_height + 0.3 * inch
+            except Exception:
+                c.setFont("Helvetica", 10)
+                c.setFillColor(colors.red)
+                c.drawCentredString(width / 2, y, "[Image could not be loaded]")
+                y -= 0.4 * inch
+
+            c.setFont("Helvetica", 11)
+            c.setFillColor(colors.black)
+            wrapped_desc = []
+            for paragraph in page["description"].split("\n"):
+                wrapped_desc.extend(wrap(paragraph, width=100))
+
+            text = c.beginText(margin, y)
+            text.setLeading(14)
+            for line in wrapped_desc:
+                text.textLine(line)
+            c.drawText(text)
+
+            c.showPage()
+        except Exception as e:
+            logger.error("Error processing artwork %s: %s", page.get("id"), e)
+            continue
+
+    c.save()
+    return buffer.getvalue()
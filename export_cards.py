@@ -0,0 +1,146 @@
+"""Bulk export of exhibition cards for every stored exhibition
+
+Reads the exhibition summaries (`selected_ids` and the JSON `preferences`
+column) from the local outbox or a CSV/Parquet export and renders one card
+per participant with the app's layout. Every distinct image is fetched and
+resized once into the shared image cache before rendering starts, then the
+cards are rendered in parallel worker processes. A malformed summary row or
+a failed render is logged and counted without stopping the export:
+
+    python export_cards.py --out cards/
+    python export_cards.py --summary summary.csv --zip cards.zip --workers 8
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+import catalog_store
+from analysis import read_outbox, read_table
+from exhibition_pdf import exhibition_pages, generate_exhibition_pdf
+from image_cache import DEFAULT_DIR as IMAGE_CACHE_DIR, ImageCache
+from outbox import DEFAULT_PATH as OUTBOX_PATH
+
+logger = logging.getLogger(__name__)
+
+
+def _text(value):
+    # Empty cells of CSV exports come back as NaN
+    return "" if value is None or (not isinstance(value, str) and pd.isna(value)) else str(value)
+
+
+def exhibitions_from_summary(summary, catalog):
+    """(name, title, description, pages) for every readable summary row, with unique file names
+
+    Returns the exhibitions and the number of rows skipped because their
+    preferences could not be read.
+    """
+    exhibitions, seen, skipped = [], {}, 0
+    for position, row in enumerate(summary.to_dict("records")):
+        code = _text(row.get("user_code")).strip() or f"exhibition-{position + 1}"
+        name = re.sub(r"[^A-Za-z0-9_-]+", "_", code)
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            name = f"{name}-{seen[name]}"
+        selected_ids = [aid.strip() for aid in _text(row.get("selected_ids")).split(",") if aid.strip()]
+        try:
+            preferences = json.loads(_text(row.get("preferences")) or "{}")
+            pages = exhibition_pages(selected_ids, catalog, preferences)
+        except Exception as e:
+            logger.error("Skipping summary row %d (%s): unreadable preferences: %s", position + 1, code, e)
+            skipped += 1
+            continue
+        exhibitions.append((
+            name,
+            _text(row.get("exhibition_title")),
+            _text(row.get("exhibition_description")),
+            pages,
+        ))
+    return exhibitions, skipped
+
+
+def _render(job):
+    name, title, description, pages, cache_root = job
+    return name, generate_exhibition_pdf(title, description, pages, cache_root=cache_root)
+
+
+def export(exhibitions, out_dir=None, zip_path=None, cache_root=IMAGE_CACHE_DIR, workers=None):
+    """Render every exhibition and write `<name>.pdf` files to a directory and/or a zip
+
+    Returns the number of cards written and the number that failed to render.
+    """
+    urls = {page["image_url"] for _, _, _, pages in exhibitions for page in pages if page["image_url"]}
+    images = ImageCache(cache_root).get_many(urls, "pdf")
+    failed = sum(1 for content in images.values() if content is None)
+    logger.info("Cached %d distinct images (%d failed)", len(images), failed)
+
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    archive = zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) if zip_path else None
+    jobs = [(name, title, description, pages, cache_root) for name, title, description, pages in exhibitions]
+    count = failed = 0
+    try:
+        # Spawned, not forked: the image cache above has already started threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futures = {pool.submit(_render, job): job[0] for job in jobs}
+            for future in as_completed(futures):
+                # Dropped as soon as it is written, so finished cards are not all kept in memory
+                name = futures.pop(future)
+                try:
+                    _, content = future.result()
+                except Exception as e:
+                    logger.error("Could not render the card of %s: %r", name, e)
+                    failed += 1
+                    continue
+                if out_dir:
+                    with open(os.path.join(out_dir, f"{name}.pdf"), "wb") as f:
+                        f.write(content)
+                if archive:
+                    archive.writestr(f"{name}.pdf", content)
+                count += 1
+    finally:
+        if archive:
+            archive.close()
+    return count, failed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render exhibition cards for all stored exhibitions")
+    parser.add_argument("--outbox", default=os.environ.get("DIGITALMUSEUM_OUTBOX", OUTBOX_PATH),
+                        help="local outbox to read exhibition summaries from (default)")
+    parser.add_argument("--summary", help="exhibition summary export (CSV/Parquet/Excel) instead of the outbox")
+    parser.add_argument("--out", help="directory to write one PDF per exhibition to")
+    parser.add_argument("--zip", help="zip file to write the PDFs to")
+    parser.add_argument("--image-cache", default=os.environ.get("DIGITALMUSEUM_IMAGE_CACHE", IMAGE_CACHE_DIR))
+    parser.add_argument("--workers", type=int, help="render processes (default: one per CPU)")
+    args = parser.parse_args(argv)
+    if not args.out and not args.zip:
+        parser.error("give --out, --zip or both")
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    summary = read_table(args.summary) if args.summary else read_outbox(args.outbox)[1]
+    if summary.empty:
+        print("No exhibitions found")
+        return
+    catalog = catalog_store.load_catalog()
+    exhibitions, skipped = exhibitions_from_summary(summary, catalog)
+
+    started = time.perf_counter()
+    count, failed = export(exhibitions, args.out, args.zip, args.image_cache, args.workers)
+    print(f"Rendered {count} exhibition cards in {time.perf_counter() - started:.1f}s")
+    if skipped or failed:
+        print(f"{skipped} summary rows skipped, {failed} cards failed to render (see the log)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
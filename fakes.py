@@ -0,0 +1,344 @@
+"""Local stand-ins for external services, used for benchmarks and manual testing"""
+import hashlib
+import itertools
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+_ids = itertools.count(1)
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeAPIError(Exception):
+    """Mimics gspread.exceptions.APIError, which exposes the HTTP response"""
+
+    def __init__(self, status_code, message="Fake API error"):
+        super().__init__(f"{status_code}: {message}")
+        self.response = FakeResponse(status_code)
+
+
+class FakeWorksheet:
+    """In-memory worksheet implementing the gspread calls the app relies on
+
+    `latency` adds a delay to every API call and `failures` is a list of
+    status codes raised, in order, by the next API calls (e.g. [429, 429]
+    to simulate quota exhaustion).
+    """
+
+    def __init__(self, title="Sheet1", rows=None, latency=0.0, failures=None, spreadsheet=None):
+        self.id = next(_ids)
+        self.title = title
+        self.spreadsheet = spreadsheet
+        self.rows = [list(row) for row in rows or []]
+        self.latency = latency
+        self.failures = list(failures or [])
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def _api_call(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            failure = self.failures.pop(0) if self.failures else None
+        if self.latency:
+            time.sleep(self.latency)
+        if failure:
+            raise FakeAPIError(failure)
+
+    @property
+    def call_count(self):
+        return sum(self.calls.values())
+
+    def get_all_values(self):
+        self._api_call("get_all_values")
+        with self._lock:
+            return [list(row) for row in self.rows]
+
+    def get(self, range_name):
+        """Values of an A1 range such as "A2:F501", with trailing empty cells and rows trimmed"""
+        self._api_call("get")
+        first, last = _parse_a1(range_name)
+        with self._lock:
+            rows = [row[first[1] - 1:last[1]] for row in self.rows[first[0] - 1:last[0]]]
+        rows = [_rstrip(row) for row in rows]
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+    def row_values(self, row):
+        self._api_call("row_values")
+        with self._lock:
+            return list(self.rows[row - 1]) if row <= len(self.rows) else []
+
+    def append_row(self, values, value_input_option="RAW"):
+        self._api_call("append_row")
+        with self._lock:
+            self.rows.append([str(v) for v in values])
+
+    def append_rows(self, values, value_input_option="RAW"):
+        self._api_call("append_rows")
+        with self._lock:
+            self.rows.extend([str(v) for v in row] for row in values)
+
+    def col_values(self, col):
+        self._api_call("col_values")
+        with self._lock:
+            return [row[col - 1] if col <= len(row) else '' for row in self.rows]
+
+
+
+def _parse_a1(range_name):
+    """((row, col), (row, col)) of an A1 range like "A2:F501"; open-ended parts run to the sheet edge"""
+    cells = []
+    parts = range_name.split("!")[-1].split(":")
+    for i, part in enumerate(parts):
+        letters = "".join(ch for ch in part if ch.isalpha())
+        digits = "".join(ch for ch in part if ch.isdigit())
+        col = 0
+        for ch in letters.upper():
+            col = col * 26 + ord(ch) - ord("A") + 1
+        default = 1 if i == 0 and len(parts) > 1 else 10 ** 9
+        cells.append((int(digits) if digits else default, col or default))
+    return cells[0], cells[-1]
+
+
+def _rstrip(row):
+    row = list(row)
+    while row and row[-1] == '':
+        row.pop()
+    return row
+
+
+class FakeSpreadsheet:
+    """In-memory spreadsheet holding FakeWorksheets by title"""
+
+    def __init__(self, title="Spreadsheet", worksheet_titles=(), latency=0.0):
+        self.id = f"fake-spreadsheet-{next(_ids)}"
+        self.title = title
+        self.latency = latency
+        self.calls = {}
+        self._worksheets = {}
+        for name in worksheet_titles:
+            self.add_worksheet(name)
+
+    def _api_call(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def add_worksheet(self, title, rows=None, **kwargs):
+        worksheet = FakeWorksheet(title, rows=rows, latency=kwargs.get("latency", self.latency), spreadsheet=self)
+        self._worksheets[title] = worksheet
+        return worksheet
+
+    def worksheet(self, title):
+        self._api_call("worksheet")
+        if title not in self._worksheets:
+            raise FakeAPIError(404, f"Worksheet {title!r} not found")
+        return self._worksheets[title]
+
+    def worksheets(self):
+        self._api_call("worksheets")
+        return list(self._worksheets.values())
+
+    @property
+    def sheet1(self):
+        self._api_call("sheet1")
+        return next(iter(self._worksheets.values()))
+
+    def fetch_sheet_metadata(self):
+        self._api_call("fetch_sheet_metadata")
+        return {"properties": {"title": self.title},
+                "sheets": [{"properties": {"title": title}} for title in self._worksheets]}
+
+
+class FakeClient:
+    """Stand-in for an authorized gspread client"""
+
+    def __init__(self, spreadsheets=(), latency=0.0):
+        self.latency = latency
+        self.calls = {}
+        self._spreadsheets = {spreadsheet.id: spreadsheet for spreadsheet in spreadsheets}
+
+    def _api_call(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def open(self, title):
+        self._api_call("open")
+        for spreadsheet in self._spreadsheets.values():
+            if spreadsheet.title == title:
+                return spreadsheet
+        raise FakeAPIError(404, f"Spreadsheet {title!r} not found")
+
+    def open_by_key(self, key):
+        self._api_call("open_by_key")
+        if key not in self._spreadsheets:
+            raise FakeAPIError(404, f"Spreadsheet {key!r} not found")
+        return self._spreadsheets[key]
+
+
+class FakeHTTPResponse:
+    def __init__(self, status_code, content=b""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise FakeAPIError(self.status_code, "HTTP error")
+
+
+class FakeImageSession:
+    """Stand-in for the requests.Session used to fetch artwork images
+
+    Every URL serves the same generated JPEG after `latency` seconds; URLs
+    listed in `missing` answer 404.
+    """
+
+    def __init__(self, latency=0.0, size=(2400, 1800), missing=()):
+        self.latency = latency
+        self.size = size
+        self.missing = set(missing)
+        self.requests = []
+        self.bytes_served = 0
+        self._content = None
+        self._lock = threading.Lock()
+
+    def _image(self):
+        if self._content is None:
+            import io
+            from PIL import Image
+
+            out = io.BytesIO()
+            Image.new("RGB", self.size, (120, 90, 60)).save(out, format="JPEG", quality=90)
+            self._content = out.getvalue()
+        return self._content
+
+    def get(self, url, timeout=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        with self._lock:
+            self.requests.append(url)
+            if url in self.missing:
+                return FakeHTTPResponse(404)
+            content = self._image()
+            self.bytes_served += len(content)
+        return FakeHTTPResponse(200, content)
+
+    def mount(self, *args):
+        pass
+
+class FakeTextBackend:
+    """Deterministic stand-in for a text-generation backend
+
+    Each output is derived from a hash of the prompt. `latency` is added to
+    every call and `failures` lists status codes raised, in order, by the
+    next calls (e.g. [429] to exercise retries). `batch_size` limits the
+    prompts per call, like a backend without a batch endpoint (None: any).
+    """
+
+    def __init__(self, model="fake-model", latency=0.0, failures=None, batch_size=None):
+        self.model = model
+        self.batch_size = batch_size
+        self.latency = latency
+        self.failures = list(failures or [])
+        self.calls = 0
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def generate(self, prompts, **params):
+        if self.batch_size and len(prompts) > self.batch_size:
+            raise ValueError(f"at most {self.batch_size} prompts per call")
+        with self._lock:
+            self.calls += 1
+            failure = self.failures.pop(0) if self.failures else None
+            if failure is None:
+                self.prompts.extend(prompts)
+        if self.latency:
+            time.sleep(self.latency)
+        if failure:
+            raise FakeAPIError(failure)
+        return [f"Generated story {hashlib.sha256(prompt.encode()).hexdigest()[:12]} "
+                f"({self.model}, temperature {params.get('temperature')})" for prompt in prompts]
+
+
+class CollectionAPIStub:
+    """Local HTTP server mimicking the Rijksmuseum collection search and detail endpoints
+
+    `artworks` maps a search query to a list of art objects (dicts with at
+    least "objectNumber"); `descriptions` maps object numbers to label text.
+    Every `fail_every`-th request answers 429 to exercise retries.
+
+        with CollectionAPIStub(artworks, descriptions) as stub:
+            client = CollectionClient("key", stub.endpoint)
+    """
+
+    def __init__(self, artworks, descriptions=None, latency=0.0, fail_every=0):
+        self.artworks = artworks
+        self.descriptions = descriptions or {}
+        self.latency = latency
+        self.fail_every = fail_every
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self):
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/api/en/collection"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _respond(self, path, params):
+        with self._lock:
+            self.requests.append(path)
+            count = len(self.requests)
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_every and count % self.fail_every == 0:
+            return 429, {}
+        parts = path.rstrip("/").split("/")
+        if parts[-1] != "collection":
+            object_number = parts[-1]
+            if object_number not in self.descriptions:
+                return 404, {}
+            return 200, {"artObject": {"objectNumber": object_number,
+                                       "label": {"description": self.descriptions[object_number]}}}
+        results = self.artworks.get(params.get("q", [""])[0], [])
+        page_size = int(params.get("ps", ["10"])[0])
+        page = max(1, int(params.get("p", ["1"])[0]))
+        start = (page - 1) * page_size
+        return 200, {"count": len(results), "artObjects": results[start:start + page_size]}
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                url = urlparse(self.path)
+                status, body = stub._respond(url.path, parse_qs(url.query))
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,278 @@
+"""On-disk cache of artwork images and their resized derivatives
+
+The metadata points at full-resolution originals ("=s0"). Each original is
+downloaded once, and Pillow derivatives are generated for every display
+size the app uses. Files are content-addressed by a hash of the URL and
+derivative size, and the cache is kept under a byte cap by evicting the
+least recently used files.
+
+Pages never download on the script thread: on a miss `get_or_url` returns
+the remote URL and fills the cache in the background. Images that could not
+be fetched are not tried again for `failure_ttl` seconds.
+"""
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, wait as wait_futures
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image as PILImage
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "image_cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# Longest edge in pixels for each display size. Grid thumbnails render at
+# width=160 and the description view at width=400, so both are stored at
+# twice that for high-density screens; PDF pages hold a 4 inch tall image.
+SIZES = {
+    "grid": 320,
+    "description": 800,
+    "full": 1400,
+    "pdf": 1200,
+}
+
+
+def make_session(pool_size=16):
+    """HTTP session with a connection pool large enough for parallel fetches"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=1)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def cache_key(url, size=None):
+    return hashlib.sha256(f"{url}|{size or 'original'}".encode()).hexdigest()
+
+
+class ImageUnavailable(Exception):
+    """The image failed recently and is not fetched again until its failure expires"""
+
+
+class ImageCache:
+    """Content-addressed image cache with a size cap and LRU eviction"""
+
+    def __init__(self, root=DEFAULT_DIR, max_bytes=DEFAULT_MAX_BYTES, timeout=10, session=None, max_workers=8,
+                 failure_ttl=300):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.failure_ttl = failure_ttl
+        self.max_workers = max_workers
+        self.session = session or make_session(max_workers * 2)
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="image-fetch")
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._prefetching = {}
+        # URL -> time until which it is not fetched again
+        self._failed = {}
+        os.makedirs(root, exist_ok=True)
+        self._size = sum(entry.stat().st_size for entry in os.scandir(root) if entry.is_file())
+
+    def _path(self, key):
+        return os.path.join(self.root, key)
+
+    def _key_lock(self, key):
+        # Concurrent requests for the same image wait for a single download
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _read(self, key):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                content = f.read()
+        except FileNotFoundError:
+            return None
+        # Access time drives LRU eviction; touch explicitly since many
+        # filesystems are mounted with noatime
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return content
+
+    def _write(self, key, content):
+        # Write to a temporary file and rename so readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        path = self._path(key)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size += len(content) - previous
+        if self._size > self.max_bytes:
+            self._evict()
+
+    def _evict(self):
+        with self._lock:
+            entries = [entry for entry in os.scandir(self.root) if entry.is_file() and not entry.name.startswith(".tmp-")]
+            entries.sort(key=lambda entry: entry.stat().st_mtime)
+            target = self.max_bytes * 0.9
+            for entry in entries:
+                if self._size <= target:
+                    break
+                try:
+                    size = entry.stat().st_size
+                    os.remove(entry.path)
+                    self._size -= size
+                except OSError:
+                    continue
+
+    def _check_failed(self, url):
+        with self._lock:
+            until = self._failed.get(url)
+            if until is not None and until <= time.monotonic():
+                del self._failed[url]
+                until = None
+        if until is not None:
+            raise ImageUnavailable(f"{url} failed recently; retrying after {self.failure_ttl}s")
+
+    def recently_failed(self, url):
+        try:
+            self._check_failed(url)
+        except ImageUnavailable:
+            return True
+        return False
+
+    def original(self, url):
+        """Bytes of the original image, downloaded on first use"""
+        key = cache_key(url)
+        content = self._read(key)
+        if content is not None:
+            return content
+        with self._key_lock(key):
+            content = self._read(key)
+            if content is None:
+                with metrics.span("image_fetch"):
+                    response = self.session.get(url, timeout=self.timeout)
+                    response.raise_for_status()
+                    content = response.content
+                metrics.incr("image_fetches_total")
+                metrics.incr("image_fetch_bytes_total", len(content))
+                self._write(key, content)
+        return content
+
+    def get(self, url, size):
+        """JPEG bytes of the image resized for a display size (see SIZES)"""
+        key = cache_key(url, size)
+        content = self._read(key)
+        if content is not None:
+            metrics.incr("cache_hits_total", cache="image")
+            return content
+        self._check_failed(url)
+        with self._key_lock(key):
+            content = self._read(key)
+            if content is None:
+                # Another thread may have just failed on the same image
+                self._check_failed(url)
+                metrics.incr("cache_misses_total", cache="image")
+                try:
+                    original = self.original(url)
+                    with metrics.span("image_resize"):
+                        content = make_derivative(original, SIZES[size])
+                except Exception:
+                    metrics.incr("image_failures_total")
+                    with self._lock:
+                        self._failed[url] = time.monotonic() + self.failure_ttl
+                    raise
+                self._write(key, content)
+        return content
+
+    def get_many(self, urls, size):
+        """Fetch several images in parallel; maps each URL to its bytes, or None on failure"""
+        unique = list(dict.fromkeys(url for url in urls if url))
+        futures = {url: self._pool.submit(self.get, url, size) for url in unique}
+        results = {}
+        for url, future in futures.items():
+            try:
+                results[url] = future.result()
+            except Exception as e:
+                logger.warning("Could not load image %s: %s", url, e)
+                results[url] = None
+        return results
+
+    def prefetch(self, url, size):
+        """Start producing a derivative in the background; returns without waiting
+
+        Returns the future of the running prefetch, or None if the image is
+        cached or failed recently. A later get() for the same image waits
+        for the running download instead of starting another one.
+        """
+        if not url or self.recently_failed(url):
+            return None
+        key = cache_key(url, size)
+        with self._lock:
+            future = self._prefetching.get(key)
+            if future is not None or os.path.exists(self._path(key)):
+                return future
+            future = self._prefetching[key] = self._pool.submit(self._prefetch, key, url, size)
+        metrics.incr("image_prefetches_total")
+        return future
+
+    def _prefetch(self, key, url, size):
+        try:
+            self.get(url, size)
+        except Exception as e:
+            logger.warning("Could not prefetch image %s: %s", url, e)
+        finally:
+            with self._lock:
+                self._prefetching.pop(key, None)
+
+    def get_or_url(self, url, size, wait=2.0):
+        """Cached derivative bytes, or the remote URL while the cache is filled in the background
+
+        Never downloads on the calling thread. A derivative already being
+        produced (e.g. prefetched for the next artwork) is waited for up to
+        `wait` seconds before falling back to the URL.
+        """
+        if not url:
+            return url
+        key = cache_key(url, size)
+        content = self._read(key)
+        if content is None:
+            future = self.prefetch(url, size)
+            if future is not None and wait:
+                try:
+                    future.result(timeout=wait)
+                except FutureTimeout:
+                    return url
+            content = self._read(key)
+            if content is None:
+                return url
+        metrics.incr("cache_hits_total", cache="image")
+        return content
+
+    def get_many_or_urls(self, urls, size, wait=0.5):
+        """get_or_url for a whole page of images, waiting at most `wait` seconds in total
+
+        Every missing derivative is prefetched at once, so a cold page costs
+        one shared wait instead of one per image; whatever is not ready by
+        then is shown from its URL while the cache fills in the background.
+        """
+        unique = list(dict.fromkeys(url for url in urls if url))
+        futures = [future for future in (self.prefetch(url, size) for url in unique) if future is not None]
+        if futures and wait:
+            wait_futures(futures, timeout=wait)
+        return {url: self.get_or_url(url, size, wait=0) for url in unique}
+
+
+def make_derivative(content, max_edge, quality=85):
+    """Downscale image bytes so the longest edge is at most `max_edge` pixels"""
+    with PILImage.open(io.BytesIO(content)) as image:
+        image.draft("RGB", (max_edge, max_edge))
+        image = image.convert("RGB")
+        image.thumbnail((max_edge, max_edge), PILImage.LANCZOS)
+        out = io.BytesIO()
+        image.save(out, format="JPEG", quality=quality, optimize=True, progressive=True)
+    return out.getvalue()
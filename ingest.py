@@ -0,0 +1,229 @@
+"""Metadata ingestion from the Rijksmuseum collection API
+
+Replaces the retrieve_metadata_from_apis notebook for larger collections:
+pages through every search result for each theme, fetches object details
+concurrently under a token-bucket rate limit with retries, and appends each
+finished record to a JSONL checkpoint so an interrupted run resumes where it
+stopped. Records are deduplicated by object number.
+
+    python ingest.py --themes landscape animals --max-per-theme 500
+"""
+import argparse
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from retry import TokenBucket, call_with_retries
+
+logger = logging.getLogger(__name__)
+
+RIJKSMUSEUM_ENDPOINT = "https://www.rijksmuseum.nl/api/en/collection"
+DEFAULT_THEMES = ["landscape", "animals", "history", "still life", "mythology"]
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+DEFAULT_CHECKPOINT = os.path.join(DATA_DIR, "ingest_checkpoint.jsonl")
+DEFAULT_OUTPUT = os.path.join(DATA_DIR, "real_museum_metadata.json")
+
+# The API refuses to page beyond 10,000 results per query
+MAX_RESULTS_PER_QUERY = 10000
+
+
+class CollectionClient:
+    """Rate-limited, retrying client for the collection search and detail endpoints"""
+
+    def __init__(self, api_key, endpoint=RIJKSMUSEUM_ENDPOINT, rate=10.0, retries=5, timeout=15, pool_size=16,
+                 sleep=time.sleep):
+        self.api_key = api_key
+        self.endpoint = endpoint.rstrip("/")
+        self.bucket = TokenBucket(rate)
+        self.retries = retries
+        self.timeout = timeout
+        self._sleep = sleep
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def _get(self, url, params):
+        self.bucket.acquire()
+        response = self.session.get(url, params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response
+
+    def _get_json(self, url, params):
+        params = {"key": self.api_key, "format": "json", **params}
+        response = call_with_retries(self._get, url, params, max_retries=self.retries, sleep=self._sleep,
+                                     label=f"Request to {url}")
+        return response.json()
+
+    def search(self, query, theme=None, page_size=100, max_items=None):
+        """Yield artwork records for every page of a search"""
+        seen = 0
+        page = 1
+        while page * page_size <= MAX_RESULTS_PER_QUERY:
+            data = self._get_json(self.endpoint, {"q": query, "ps": page_size, "p": page})
+            art_objects = data.get("artObjects", [])
+            for art_obj in art_objects:
+                yield {
+                    "id": art_obj.get("objectNumber"),
+                    "title": art_obj.get("title"),
+                    "artist": art_obj.get("principalOrFirstMaker"),
+                    "longTitle": art_obj.get("longTitle"),
+                    "image_url": (art_obj.get("webImage") or {}).get("url"),
+                    "theme": theme,
+                    "description": None,
+                }
+                seen += 1
+                if max_items and seen >= max_items:
+                    return
+            if len(art_objects) < page_size or seen >= data.get("count", 0):
+                return
+            page += 1
+
+    def fetch_description(self, object_number):
+        try:
+            data = self._get_json(f"{self.endpoint}/{object_number}", {})
+        except requests.HTTPError as e:
+            # Objects without a detail page are recorded without a description
+            if e.response is not None and e.response.status_code == 404:
+                return None
+            raise
+        return ((data.get("artObject") or {}).get("label") or {}).get("description")
+
+
+class Checkpoint:
+    """Append-only JSONL log of fetched records"""
+
+    def __init__(self, path, fsync_every=50):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._lock = threading.Lock()
+        self._unsynced = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def load(self):
+        """Records written by earlier runs, keyed by object number (last write wins)"""
+        records = {}
+        if not os.path.exists(self.path):
+            return records
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # A crash can leave a truncated final line
+                    continue
+                records[record["id"]] = record
+        return records
+
+    def __enter__(self):
+        # Start on a fresh line after a truncated one, or the first new
+        # record would be lost with it
+        truncated = False
+        if os.path.exists(self.path) and os.path.getsize(self.path):
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                truncated = f.read(1) != b"\n"
+        self._file = open(self.path, "a", encoding="utf-8")
+        if truncated:
+            self._file.write("\n")
+        return self
+
+    def __exit__(self, *exc):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def append(self, record):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._unsynced += 1
+            if self._unsynced >= self.fsync_every:
+                os.fsync(self._file.fileno())
+                self._unsynced = 0
+
+
+def ingest(client, checkpoint, themes, max_per_theme=None, page_size=100, workers=8):
+    """Fetch every theme's artworks into the checkpoint; returns all known records"""
+    records = checkpoint.load()
+    if records:
+        logger.info("Resuming with %d records from %s", len(records), checkpoint.path)
+
+    pending = {}
+    for theme in themes:
+        found = 0
+        for artwork in client.search(theme, theme=theme, page_size=page_size, max_items=max_per_theme):
+            object_number = artwork["id"]
+            if not object_number or object_number in records or object_number in pending:
+                continue
+            pending[object_number] = artwork
+            found += 1
+        logger.info("Theme %r: %d new artworks", theme, found)
+
+    with checkpoint, ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(client.fetch_description, object_number): artwork
+                   for object_number, artwork in pending.items()}
+        for done, future in enumerate(as_completed(futures), 1):
+            artwork = futures[future]
+            try:
+                artwork["description"] = future.result()
+            except Exception as e:
+                # Not checkpointed, so the next run tries again
+                logger.error("Failed to fetch details for %s: %s", artwork["id"], e)
+                continue
+            checkpoint.append(artwork)
+            records[artwork["id"]] = artwork
+            if done % 100 == 0:
+                logger.info("Fetched details for %d/%d artworks", done, len(futures))
+
+    return records
+
+
+def export(records, output_path):
+    """Write records with a description to the metadata JSON, atomically"""
+    artworks = [record for record in records.values() if record.get("description")]
+    tmp_path = output_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(artworks, f, indent=4)
+    os.replace(tmp_path, output_path)
+    return len(artworks)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch artwork metadata from the Rijksmuseum collection API")
+    parser.add_argument("--api-key", default=os.environ.get("RIJKSMUSEUM_API_KEY"),
+                        help="API key (default: $RIJKSMUSEUM_API_KEY)")
+    parser.add_argument("--endpoint", default=RIJKSMUSEUM_ENDPOINT)
+    parser.add_argument("--themes", nargs="+", default=DEFAULT_THEMES)
+    parser.add_argument("--max-per-theme", type=int, help="stop after this many search results per theme")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--rate", type=float, default=10.0, help="maximum requests per second")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--retries", type=int, default=5)
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT)
+    parser.add_argument("--output", default=DEFAULT_OUTPUT)
+    args = parser.parse_args(argv)
+
+    if not args.api_key:
+        parser.error("an API key is required (--api-key or RIJKSMUSEUM_API_KEY)")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    client = CollectionClient(args.api_key, args.endpoint, rate=args.rate, retries=args.retries,
+                              pool_size=args.workers * 2)
+    records = ingest(client, Checkpoint(args.checkpoint), args.themes, args.max_per_theme,
+                     args.page_size, args.workers)
+    count = export(records, args.output)
+    print(f"Saved {count} artworks with descriptions to '{args.output}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""Lightweight in-process timing and counters for the app's hot paths
+
+Metrics are only collected when enabled through the environment:
+
+    DIGITALMUSEUM_METRICS=1                 collect; read with render()
+    DIGITALMUSEUM_METRICS_FILE=metrics.prom also write Prometheus text to this
+                                            file every DIGITALMUSEUM_METRICS_INTERVAL
+                                            seconds (default 15)
+
+When disabled, span() returns a shared no-op context manager and incr()
+and observe() return immediately, so instrumentation costs next to nothing.
+"""
+import atexit
+import functools
+import os
+import tempfile
+import threading
+import time
+
+PREFIX = "digitalmuseum_"
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+enabled = False
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_exporter = None
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def incr(name, value=1, **labels):
+    """Add to a counter"""
+    if not enabled:
+        return
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def observe(stage, seconds):
+    """Record the duration of one run of a stage"""
+    if not enabled:
+        return
+    key = _key("stage_seconds", {"stage": stage})
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * len(BUCKETS) + [0, 0.0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += 1
+        histogram[-1] += seconds
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        observe(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(stage):
+    """Context manager timing a stage"""
+    return _Span(stage) if enabled else _NOOP
+
+
+def timed(stage):
+    """Decorator timing every call of a function as a stage"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            with _Span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+def render():
+    """Current metrics in the Prometheus text exposition format"""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: list(value) for key, value in _histograms.items()}
+
+    lines = []
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# TYPE {PREFIX}{name} counter")
+        for (counter_name, labels), value in sorted(counters.items()):
+            if counter_name == name:
+                lines.append(f"{PREFIX}{name}{_format_labels(labels)} {value}")
+
+    if histograms:
+        name = f"{PREFIX}stage_seconds"
+        lines.append(f"# TYPE {name} histogram")
+        for (_, labels), histogram in sorted(histograms.items()):
+            for bound, count in zip(BUCKETS, histogram):
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram[-2]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram[-2]}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram[-1]:.6f}")
+    return "\n".join(lines) + "\n"
+
+
+def write(path):
+    """Atomically write the current metrics to a file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-")
+    with os.fdopen(fd, "w") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def _export_loop(path, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write(path)
+        except OSError:
+            pass
+
+
+def configure_from_env():
+    """Enable collection and start the file exporter according to the environment (idempotent)"""
+    global enabled, _exporter
+    path = os.environ.get("DIGITALMUSEUM_METRICS_FILE")
+    enabled = bool(path) or os.environ.get("DIGITALMUSEUM_METRICS", "") not in ("", "0")
+    if path and _exporter is None:
+        interval = float(os.environ.get("DIGITALMUSEUM_METRICS_INTERVAL", "15"))
+        _exporter = threading.Thread(target=_export_loop, args=(path, interval), name="metrics-export", daemon=True)
+        _exporter.start()
+        atexit.register(write, path)
+    return enabled
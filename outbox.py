@@ -0,0 +1,382 @@
+"""Durable local outbox for participant telemetry
+
+Every completed session is committed to a local SQLite database (WAL mode)
+before anything talks to Google Sheets. A background drainer then ships
+pending records to their worksheets and marks them sent, so a slow or
+unavailable Sheets API never blocks the participant and never loses data.
+
+Operators can inspect or replay the backlog from the command line:
+
+    python outbox.py status
+    python outbox.py list --status pending
+    python outbox.py replay KEY [KEY ...]
+    python outbox.py drain --credentials service_account.json
+"""
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from urllib.request import pathname2url
+
+import metrics
+from sheets_writer import UnconfirmedAppend
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "outbox.sqlite3")
+SPREADSHEET_NAME = "Digital Museum Streamlit Data Sheet"
+# Worksheets of the study spreadsheet; the questionnaire is filled in by the survey form
+VIEWS_SHEET = "Artwork Views"
+SUMMARY_SHEET = "Exhibition Summary"
+QUESTIONNAIRE_SHEET = "Post questionnaire"
+
+# Record states: pending -> sending -> sent. Records left in "sending" by a
+# crash, or whose append failed after it may have reached the sheet, become
+# "unconfirmed" and are checked against the sheet before resending.
+PENDING, SENDING, SENT, UNCONFIRMED = "pending", "sending", "sent", "unconfirmed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    user_code TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    worksheet TEXT NOT NULL,
+    header TEXT NOT NULL,
+    rows TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    sent_at REAL
+);
+CREATE INDEX IF NOT EXISTS outbox_status ON outbox (status, id);
+"""
+
+
+def idempotency_key(user_code, session_id, worksheet):
+    """Key that identifies one session's rows for one worksheet"""
+    return f"{user_code}:{session_id}:{worksheet}"
+
+
+def dataframe_to_record(df):
+    """Convert a DataFrame into the (header, rows) pair stored in the outbox"""
+    return df.columns.tolist(), df.fillna('').astype(str).values.tolist()
+
+
+class Outbox:
+    """Append-mostly SQLite store of session records awaiting delivery
+
+    Inspection and analysis open the outbox with `readonly=True`, so they
+    never change the state of records a running drainer is delivering.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, readonly=False):
+        self.path = path
+        self._lock = threading.Lock()
+        if readonly:
+            self._conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True,
+                                         check_same_thread=False, isolation_level=None)
+            self._conn.row_factory = sqlite3.Row
+            return
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # FULL makes every commit durable with a single fsync of the WAL
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(SCHEMA)
+
+    def recover(self):
+        """Mark records left in "sending" by a previous process as unconfirmed
+
+        Only the owner of the drainer may call this, once before it starts:
+        while a drainer runs, its in-flight records are "sending" too.
+        """
+        with self._lock:
+            cursor = self._conn.execute("UPDATE outbox SET status = ? WHERE status = ?", (UNCONFIRMED, SENDING))
+        return cursor.rowcount
+
+    def add_session(self, user_code, session_id, records):
+        """Commit one session's records ({worksheet: (header, rows)}) in a single transaction
+
+        Re-adding a session that is already stored is a no-op.
+        """
+        now = time.time()
+        params = [
+            (idempotency_key(user_code, session_id, worksheet), user_code, session_id, worksheet,
+             json.dumps(list(header), ensure_ascii=False), json.dumps(rows, ensure_ascii=False), now)
+            for worksheet, (header, rows) in records.items() if rows
+        ]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO outbox "
+                    "(idempotency_key, user_code, session_id, worksheet, header, rows, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    params,
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(params)
+
+    def claim(self, limit=100):
+        """Mark up to `limit` deliverable records as sending and return them"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT * FROM outbox WHERE status IN (?, ?) ORDER BY id LIMIT ?",
+                    (PENDING, UNCONFIRMED, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE outbox SET status = ?, attempts = attempts + 1 WHERE id = ?",
+                    [(SENDING, row["id"]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [_decode(row) for row in rows]
+
+    def mark_sent(self, record_id):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, sent_at = ?, last_error = NULL WHERE id = ?",
+                (SENT, time.time(), record_id),
+            )
+
+    def mark_failed(self, record_id, error, unconfirmed=False):
+        """Queue a record again; `unconfirmed` if some of its rows may already be in the sheet"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE outbox SET status = ?, last_error = ? WHERE id = ?",
+                (UNCONFIRMED if unconfirmed else PENDING, str(error), record_id),
+            )
+
+    def counts(self):
+        """Number of records per status"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def records(self, status=None, worksheet=None, limit=None):
+        """Stored records, oldest first, optionally filtered"""
+        query, params = "SELECT * FROM outbox WHERE 1 = 1", []
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        if worksheet:
+            query += " AND worksheet = ?"
+            params.append(worksheet)
+        query += " ORDER BY id"
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [_decode(row) for row in rows]
+
+    def replay(self, keys=None):
+        """Queue records for delivery again; all undelivered ones if no keys are given
+
+        Replayed records are checked against the sheet before being resent.
+        Records in "sending" are left alone: a running drainer may be
+        delivering them, and only its owner recovers them (see recover()).
+        """
+        with self._lock:
+            if keys:
+                cursor = self._conn.executemany(
+                    "UPDATE outbox SET status = ? WHERE idempotency_key = ? AND status != ?",
+                    [(UNCONFIRMED, key, SENDING) for key in keys],
+                )
+            else:
+                cursor = self._conn.execute(
+                    "UPDATE outbox SET status = ? WHERE status IN (?, ?)",
+                    (UNCONFIRMED, PENDING, UNCONFIRMED),
+                )
+        return cursor.rowcount
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _decode(row):
+    record = dict(row)
+    record["header"] = json.loads(record["header"])
+    record["rows"] = json.loads(record["rows"])
+    return record
+
+
+def delivered_rows(sheet, record):
+    """How many of a record's rows are already in the sheet (used after crashes, failures and replays)
+
+    A record's rows share one user code and session timestamp and are
+    appended in order, so the rows found in the sheet are a prefix of the
+    record's rows.
+    """
+    header = record["header"]
+    if "user_code" not in header or "timestamp" not in header:
+        return 0
+    metrics.incr("sheets_api_calls_total", 2, method="col_values")
+    code_col = sheet.col_values(header.index("user_code") + 1)
+    time_col = sheet.col_values(header.index("timestamp") + 1)
+    first = record["rows"][0]
+    session = (first[header.index("user_code")], first[header.index("timestamp")])
+    return min(len(record["rows"]), sum(1 for cell in zip(code_col, time_col) if cell == session))
+
+
+class OutboxDrainer:
+    """Background thread that ships outbox records to Google Sheets exactly once
+
+    `resolve_worksheet(name)` returns the gspread worksheet for a record,
+    `writer` is the shared SheetsWriter used to batch the append calls and
+    `on_error(exception)` is told about every failed delivery.
+    """
+
+    def __init__(self, outbox, resolve_worksheet, writer, interval=5.0, batch_size=100, on_error=None):
+        self.outbox = outbox
+        self.resolve_worksheet = resolve_worksheet
+        self.writer = writer
+        self.on_error = on_error
+        self.interval = interval
+        self.batch_size = batch_size
+        self._wake = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Recover records a previous process left in flight, then start draining"""
+        if self._thread is None:
+            recovered = self.outbox.recover()
+            if recovered:
+                logger.info("%d outbox records from a previous run will be checked before resending", recovered)
+            self._thread = threading.Thread(target=self._run, name="outbox-drainer", daemon=True)
+            self._thread.start()
+        return self
+
+    def notify(self):
+        """Wake the drainer so new records are shipped without waiting for the next interval"""
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                with metrics.span("outbox_drain"):
+                    self.drain_once()
+            except Exception as e:
+                logger.error("Outbox drain failed: %s", e)
+
+    def drain_once(self):
+        """Ship everything currently deliverable; returns the number of records sent"""
+        sent = 0
+        while True:
+            records = self.outbox.claim(self.batch_size)
+            if not records:
+                return sent
+            submitted, failed = [], False
+            for record in records:
+                try:
+                    sheet = self.resolve_worksheet(record["worksheet"])
+                    rows = record["rows"]
+                    if record["status"] == UNCONFIRMED:
+                        # Only the rows missing from the sheet are sent again
+                        delivered = delivered_rows(sheet, record)
+                        if delivered >= len(rows):
+                            self.outbox.mark_sent(record["id"])
+                            sent += 1
+                            continue
+                        rows = rows[delivered:]
+                    submitted.append((record, self.writer.submit(sheet, record["header"], rows)))
+                except Exception as e:
+                    self._failed(record, e)
+                    failed = True
+            for record, future in submitted:
+                try:
+                    future.result()
+                    self.outbox.mark_sent(record["id"])
+                    sent += 1
+                except Exception as e:
+                    self._failed(record, e)
+                    failed = True
+            # Failed records are queued again; leave them for the next interval
+            if failed or len(records) < self.batch_size:
+                return sent
+
+    def _failed(self, record, error):
+        # Once an append may have reached the sheet, the record stays unconfirmed
+        # until a check against the sheet shows which of its rows are missing
+        unconfirmed = record["status"] == UNCONFIRMED or isinstance(error, UnconfirmedAppend)
+        self.outbox.mark_failed(record["id"], error, unconfirmed=unconfirmed)
+        if self.on_error:
+            self.on_error(error)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect or replay the local telemetry outbox")
+    parser.add_argument("--db", default=os.environ.get("DIGITALMUSEUM_OUTBOX", DEFAULT_PATH))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("status", help="count records per status")
+
+    list_cmd = commands.add_parser("list", help="list stored records")
+    list_cmd.add_argument("--status", choices=[PENDING, SENDING, SENT, UNCONFIRMED])
+    list_cmd.add_argument("--worksheet")
+    list_cmd.add_argument("--limit", type=int)
+    list_cmd.add_argument("--rows", action="store_true", help="print the stored rows as well")
+
+    replay_cmd = commands.add_parser("replay", help="queue records for delivery again")
+    replay_cmd.add_argument("keys", nargs="*", help="idempotency keys (default: all undelivered)")
+
+    drain_cmd = commands.add_parser("drain", help="ship pending records to Google Sheets now")
+    drain_cmd.add_argument("--credentials", required=True, help="service account JSON file")
+    drain_cmd.add_argument("--spreadsheet", default=SPREADSHEET_NAME)
+
+    args = parser.parse_args(argv)
+    if args.command in ("status", "list") and not os.path.exists(args.db):
+        print(f"No outbox at '{args.db}'")
+        return
+    # Inspection never changes record states; draining here leaves the
+    # records a running app has in flight alone (the app recovers its own)
+    outbox = Outbox(args.db, readonly=args.command in ("status", "list"))
+
+    if args.command == "status":
+        counts = outbox.counts()
+        for status in (PENDING, UNCONFIRMED, SENDING, SENT):
+            print(f"{status:12} {counts.get(status, 0)}")
+    elif args.command == "list":
+        for record in outbox.records(args.status, args.worksheet, args.limit):
+            created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record["created_at"]))
+            print(f"{record['idempotency_key']}\t{record['status']}\t{len(record['rows'])} rows\t"
+                  f"{created}\tattempts={record['attempts']}\t{record['last_error'] or ''}")
+            if args.rows:
+                for row in record["rows"]:
+                    print("    " + json.dumps(dict(zip(record["header"], row)), ensure_ascii=False))
+    elif args.command == "replay":
+        print(f"Queued {outbox.replay(args.keys)} records for delivery")
+    elif args.command == "drain":
+        import gspread
+        from sheets_connection import SheetsConnection
+        from sheets_writer import SheetsWriter
+
+        writer = SheetsWriter()
+        connection = SheetsConnection(lambda: gspread.service_account(filename=args.credentials),
+                                      spreadsheet_name=args.spreadsheet)
+        drainer = OutboxDrainer(outbox, connection.worksheet, writer, on_error=connection.report_error)
+        sent = drainer.drain_once()
+        writer.close()
+        print(f"Sent {sent} records; {outbox.counts().get(PENDING, 0)} still pending")
+
+
+if __name__ == "__main__":
+    main()
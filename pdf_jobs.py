@@ -0,0 +1,133 @@
+"""Bounded process-pool queue for CPU-heavy renders
+
+Exhibition cards are rendered in worker processes so ReportLab layout and
+image decoding never run on a Streamlit script thread. Jobs are keyed by
+content: submitting a key that is already queued, running or finished
+returns the existing job. At most `max_pending` jobs may be unfinished at
+once; beyond that `submit` raises QueueFull so the caller can ask the
+participant to retry instead of piling up work.
+
+A failed job is kept for `failure_ttl` seconds so callers see the error
+instead of resubmitting it on every poll. If a worker process dies (e.g.
+killed for memory), the jobs it took down are forgotten and the pool is
+replaced on the next submission; a job whose worker dies twice counts as
+failed.
+
+Metrics are only collected in the parent process, so each job's time from
+submission to result is recorded there under the name of the function it
+runs (e.g. the `generate_exhibition_pdf` stage).
+
+Workers are spawned rather than forked, since the Streamlit server that
+owns the queue is multi-threaded.
+"""
+import logging
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(Exception):
+    """Raised when too many jobs are already waiting"""
+
+
+class JobQueue:
+    """Coalescing job queue in front of a ProcessPoolExecutor"""
+
+    def __init__(self, max_workers=None, max_pending=32, max_results=64, failure_ttl=60):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_results = max_results
+        self.failure_ttl = failure_ttl
+        self._pool = self._make_pool()
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        # Key -> time after which a failed job is forgotten and may run again
+        self._failed = {}
+        # Key -> number of times its worker died while running it
+        self._crashes = {}
+
+    def _make_pool(self):
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _pending(self):
+        return sum(1 for future in self._jobs.values() if not future.done())
+
+    def _lookup(self, key):
+        future = self._jobs.get(key)
+        if future is not None and self._failed.get(key, float("inf")) <= time.monotonic():
+            del self._jobs[key], self._failed[key]
+            return None
+        if future is not None:
+            self._jobs.move_to_end(key)
+        return future
+
+    def get(self, key):
+        """The job submitted under `key` (finished, failed or not), or None"""
+        with self._lock:
+            return self._lookup(key)
+
+    def submit(self, key, func, *args, **kwargs):
+        """Run `func(*args, **kwargs)` in a worker unless a job for `key` already exists"""
+        with self._lock:
+            future = self._lookup(key)
+            if future is not None:
+                metrics.incr("jobs_coalesced_total")
+                return future
+            if self._pending() >= self.max_pending:
+                metrics.incr("jobs_rejected_total")
+                raise QueueFull(f"{self.max_pending} jobs are already pending")
+            try:
+                future = self._pool.submit(func, *args, **kwargs)
+            except BrokenProcessPool:
+                # A worker died and the executor refuses new work; start a new pool
+                logger.warning("Process pool is broken; starting a new one")
+                metrics.incr("job_pool_restarts_total")
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = self._make_pool()
+                future = self._pool.submit(func, *args, **kwargs)
+            self._jobs[key] = future
+            self._trim()
+        metrics.incr("jobs_submitted_total")
+        submitted = time.perf_counter()
+        stage = getattr(func, "__name__", "job")
+        future.add_done_callback(lambda done: self._finished(key, done, stage, submitted))
+        return future
+
+    def _finished(self, key, future, stage, submitted):
+        metrics.observe(stage, time.perf_counter() - submitted)
+        error = None if future.cancelled() else future.exception()
+        if not future.cancelled() and error is None:
+            return
+        logger.error("Job %s failed: %r", key, error)
+        with self._lock:
+            if self._jobs.get(key) is not future:
+                return
+            if isinstance(error, BrokenProcessPool):
+                self._crashes[key] = self._crashes.get(key, 0) + 1
+            if future.cancelled() or (isinstance(error, BrokenProcessPool) and self._crashes[key] < 2):
+                # Not the job's own failure: the next submission runs it again in a new pool
+                del self._jobs[key]
+            else:
+                # Kept for a while so the error is shown instead of the job being resubmitted
+                self._failed[key] = time.monotonic() + self.failure_ttl
+
+    def _trim(self):
+        # Drop the least recently used finished results beyond max_results
+        finished = [key for key, future in self._jobs.items() if future.done()]
+        for key in finished[:max(0, len(self._jobs) - self.max_results)]:
+            del self._jobs[key]
+            self._failed.pop(key, None)
+
+    def status(self):
+        with self._lock:
+            return {"pending": self._pending(), "stored": len(self._jobs)}
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait, cancel_futures=not wait)
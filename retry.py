@@ -0,0 +1,98 @@
+"""Retries with exponential backoff, and a token-bucket rate limit
+
+Shared by the clients of external APIs (Google Sheets, the collection API
+and the text-generation backends), which all retry the same transient
+failures: quota errors, server errors and dropped connections.
+"""
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# HTTP status codes worth retrying (quota exhaustion and transient server errors)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def status_code(error):
+    """HTTP status code carried by an API error (gspread.APIError, requests.HTTPError), if any"""
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def is_retryable(error):
+    """Whether a failed call should be retried with backoff"""
+    status = status_code(error)
+    if status is None:
+        # Network-level failures (timeouts, dropped connections) carry no response
+        return isinstance(error, (ConnectionError, TimeoutError, OSError))
+    return status in RETRYABLE_STATUS
+
+
+def was_rejected(error):
+    """Whether a failed call is known not to have been applied
+
+    Only a client error answer (4xx) says so; a timeout or server error may
+    come after the request was applied.
+    """
+    status = status_code(error)
+    return status is not None and 400 <= status < 500
+
+
+def retry_after(error):
+    """Seconds to wait according to the response's Retry-After header, if it gives a number"""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    value = headers.get("Retry-After")
+    return float(value) if value and value.isdigit() else None
+
+
+def backoff_delay(attempt, base=1.0, maximum=60.0):
+    """Exponential delay before retry number `attempt` (0-based), with up to 25% jitter"""
+    return min(maximum, base * (2 ** attempt)) * (1 + random.random() * 0.25)
+
+
+def call_with_retries(func, *args, retryable=is_retryable, max_retries=5, backoff_base=1.0, backoff_max=60.0,
+                      sleep=None, on_error=None, label="Call"):
+    """Call `func(*args)`, retrying errors for which `retryable(error)` is true
+
+    `on_error(error)` is told about every failure, retried or not. A
+    Retry-After header on the error's response overrides the backoff.
+    """
+    attempt = 0
+    while True:
+        try:
+            return func(*args)
+        except Exception as e:
+            if on_error:
+                on_error(e)
+            if attempt >= max_retries or not retryable(e):
+                raise
+            delay = retry_after(e)
+            delay = backoff_delay(attempt, backoff_base, backoff_max) if delay is None else delay
+            logger.warning("%s failed (%s), retrying in %.1fs", label, e, delay)
+            (sleep or time.sleep)(delay)
+            attempt += 1
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing `rate` requests per second with bursts up to `capacity`"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, rate))
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,148 @@
+"""In-memory inverted index over the artwork catalog
+
+Built once when the catalog loads. Every token of the title, artist, long
+title, theme, description and AI story maps to the set of positions (in
+indexing order) containing it, and the sorted vocabulary makes prefix
+lookups a binary search. Results are artwork ids, so they stay valid for a
+catalog loaded separately, even from another copy of the metadata. A query matches artworks containing every query word as a
+prefix of some token ("rem night" finds Rembrandt's Night Watch); title
+and artist matches are listed first, then catalog order. Theme facets are
+counted over the matches before the theme filter is applied.
+"""
+import bisect
+import re
+import unicodedata
+from collections import defaultdict
+
+SEARCH_FIELDS = ("title", "artist", "longTitle", "theme", "description", "ai_story")
+# Matches in these fields rank above matches in the longer texts
+STRONG_FIELDS = ("title", "artist")
+# Shorter query words only match whole tokens, so one letter never expands to the whole vocabulary
+MIN_PREFIX = 2
+
+_TOKEN = re.compile(r"\w+")
+_COMBINING = re.compile(r"[\u0300-\u036f]")
+
+
+def tokenize(text):
+    """Lowercase, accent-free word tokens"""
+    if not text:
+        return []
+    text = str(text).lower()
+    if not text.isascii():
+        # Decompose accented letters and drop the accents
+        text = _COMBINING.sub("", unicodedata.normalize("NFKD", text))
+    return _TOKEN.findall(text)
+
+
+class SearchResult:
+    __slots__ = ("ids", "total", "page", "page_size", "themes")
+
+    def __init__(self, ids, total, page, page_size, themes):
+        self.ids = ids
+        self.total = total
+        self.page = page
+        self.page_size = page_size
+        self.themes = themes
+
+    @property
+    def pages(self):
+        return max(1, -(-self.total // self.page_size))
+
+
+class SearchIndex:
+    """Token -> positions of the indexed artworks, plus theme facets"""
+
+    def __init__(self):
+        self._ids = []
+        self._postings = {}
+        self._strong = {}
+        self._themes = {}
+        self._vocabulary = []
+        self.size = 0
+
+    @classmethod
+    def from_records(cls, records):
+        """Index records (dicts with an `id` and SEARCH_FIELDS) in catalog order"""
+        index = cls()
+        postings, strong = defaultdict(list), defaultdict(list)
+        for position, record in enumerate(records):
+            index._ids.append(record["id"])
+            tokens, strong_tokens = set(), set()
+            for name in SEARCH_FIELDS:
+                value = record.get(name)
+                if isinstance(value, str):
+                    words = tokenize(value)
+                    tokens.update(words)
+                    if name in STRONG_FIELDS:
+                        strong_tokens.update(words)
+            # Positions arrive in order, so every list stays sorted
+            for token in tokens:
+                postings[token].append(position)
+            for token in strong_tokens:
+                strong[token].append(position)
+            theme = record.get("theme")
+            if isinstance(theme, str) and theme:
+                index._themes.setdefault(theme, set()).add(position)
+            index.size = position + 1
+        index._postings = {token: set(positions) for token, positions in postings.items()}
+        index._strong = {token: set(positions) for token, positions in strong.items()}
+        index._vocabulary = sorted(index._postings)
+        return index
+
+    @classmethod
+    def from_dataframe(cls, df):
+        columns = ["id"] + [name for name in SEARCH_FIELDS if name in df.columns]
+        return cls.from_records(dict(zip(columns, values))
+                                for values in df[columns].itertuples(index=False, name=None))
+
+    def themes(self):
+        """Theme names with the number of artworks in each"""
+        return {theme: len(positions) for theme, positions in sorted(self._themes.items())}
+
+    def _expand(self, word):
+        if len(word) < MIN_PREFIX:
+            return [word] if word in self._postings else []
+        start = bisect.bisect_left(self._vocabulary, word)
+        end = bisect.bisect_left(self._vocabulary, word + "\uffff", start)
+        return self._vocabulary[start:end]
+
+    def _match(self, word, postings):
+        matched = set()
+        for token in self._expand(word):
+            matched |= postings.get(token, set())
+        return matched
+
+    def match(self, query):
+        """Positions matching every word of the query (all positions for an empty query)"""
+        words = tokenize(query)
+        if not words:
+            return set(range(self.size))
+        # Narrow with the rarest word first
+        sets = sorted((self._match(word, self._postings) for word in words), key=len)
+        matched = set(sets[0])
+        for other in sets[1:]:
+            matched &= other
+            if not matched:
+                break
+        return matched
+
+    def search(self, query="", theme=None, page=0, page_size=24):
+        """One page of matching artwork ids, best matches first"""
+        matched = self.match(query)
+        themes = {name: len(matched & positions) for name, positions in sorted(self._themes.items())}
+        if theme:
+            matched &= self._themes.get(theme, set())
+
+        words = tokenize(query)
+        if words:
+            strong = set(matched)
+            for word in words:
+                strong &= self._match(word, self._strong)
+            ordered = sorted(strong) + sorted(matched - strong)
+        else:
+            ordered = sorted(matched)
+        total = len(ordered)
+        page = max(0, min(page, max(0, (total - 1) // page_size)))
+        ids = [self._ids[position] for position in ordered[page * page_size:(page + 1) * page_size]]
+        return SearchResult(ids, total, page, page_size, themes)
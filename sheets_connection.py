@@ -0,0 +1,117 @@
+"""Cached connection to the study spreadsheet
+
+The spreadsheet is resolved once per process (by key when one is
+configured, otherwise by name, after which its key is remembered) and
+worksheet handles are kept for reuse. Nothing here touches the network
+until a handle is first needed, and a background thread checks the
+connection periodically so page navigation never waits on it. Handles are
+only rebuilt after an authentication or expiry error.
+"""
+import logging
+import threading
+import time
+
+from google.auth.exceptions import RefreshError
+
+import metrics
+from retry import status_code
+
+logger = logging.getLogger(__name__)
+
+# Errors after which the client and handles are rebuilt: bad or expired
+# credentials, or a spreadsheet that was moved or re-shared
+REFRESH_STATUS = {401, 403, 404}
+
+
+def needs_refresh(error):
+    """Whether an error means the cached client or handles are no longer valid"""
+    return isinstance(error, RefreshError) or status_code(error) in REFRESH_STATUS
+
+
+class SheetsConnection:
+    """Process-wide spreadsheet and worksheet handles
+
+    `authorize()` returns a gspread client; it is called lazily and again
+    whenever the handles have to be refreshed.
+    """
+
+    def __init__(self, authorize, spreadsheet_key=None, spreadsheet_name=None, health_interval=300):
+        if not spreadsheet_key and not spreadsheet_name:
+            raise ValueError("a spreadsheet key or name is required")
+        self._authorize = authorize
+        self.spreadsheet_key = spreadsheet_key
+        self.spreadsheet_name = spreadsheet_name
+        self.health_interval = health_interval
+        self._lock = threading.RLock()
+        self._client = None
+        self._spreadsheet = None
+        self._worksheets = {}
+        self.healthy = None
+        self.last_error = None
+        self.last_checked = None
+        self._health_thread = None
+
+    def spreadsheet(self):
+        with self._lock:
+            if self._spreadsheet is None:
+                with metrics.span("sheets_open"):
+                    if self._client is None:
+                        self._client = self._authorize()
+                    if self.spreadsheet_key:
+                        metrics.incr("sheets_api_calls_total", method="open_by_key")
+                        self._spreadsheet = self._client.open_by_key(self.spreadsheet_key)
+                    else:
+                        metrics.incr("sheets_api_calls_total", method="open")
+                        self._spreadsheet = self._client.open(self.spreadsheet_name)
+                        # Later refreshes skip the Drive search by name
+                        self.spreadsheet_key = self._spreadsheet.id
+            return self._spreadsheet
+
+    def worksheet(self, name):
+        """Cached handle for a worksheet of the study spreadsheet"""
+        with self._lock:
+            handle = self._worksheets.get(name)
+            if handle is None:
+                spreadsheet = self.spreadsheet()
+                metrics.incr("sheets_api_calls_total", method="worksheet")
+                handle = self._worksheets[name] = spreadsheet.worksheet(name)
+            return handle
+
+    def invalidate(self):
+        """Drop the client and all handles; they are rebuilt on next use"""
+        with self._lock:
+            self._client = None
+            self._spreadsheet = None
+            self._worksheets = {}
+
+    def report_error(self, error):
+        """Record a failed Sheets call, refreshing the handles if the error requires it"""
+        self.last_error = error
+        if needs_refresh(error):
+            logger.warning("Refreshing Google Sheets handles after error: %s", error)
+            self.invalidate()
+
+    def check(self):
+        """Make one lightweight metadata call and record whether the connection works"""
+        try:
+            spreadsheet = self.spreadsheet()
+            metrics.incr("sheets_api_calls_total", method="fetch_sheet_metadata")
+            spreadsheet.fetch_sheet_metadata()
+            self.healthy, self.last_error = True, None
+        except Exception as e:
+            self.healthy = False
+            self.report_error(e)
+        self.last_checked = time.time()
+        return self.healthy
+
+    def start_health_check(self):
+        """Check the connection in the background every `health_interval` seconds"""
+        if self._health_thread is None:
+            self._health_thread = threading.Thread(target=self._run_health_check, name="sheets-health", daemon=True)
+            self._health_thread.start()
+        return self
+
+    def _run_health_check(self):
+        while True:
+            self.check()
+            time.sleep(self.health_interval)
@@ -0,0 +1,309 @@
+"""Incremental local mirror of the study worksheets
+
+Keeps a SQLite copy of "Artwork Views", "Exhibition Summary" and the post
+questionnaire so monitoring and analysis never pull whole worksheets. Each
+worksheet has a row cursor: a sync reads only the rows after it, in ranged
+batch reads, and commits every batch together with the new cursor so an
+interrupted sync resumes where it stopped.
+
+Integrity is tracked with a hash per row and a chained digest over all
+rows. Every sync re-reads the last mirrored row and compares its hash, so
+an edit of that row, or rows deleted or inserted above it (which shift it),
+trigger a full resync. Edits to earlier rows leave that row in place and
+are not seen by a sync; `verify` re-reads the whole worksheet in batches
+and compares row count and digest, and `verify --repair` resyncs.
+
+    python sheets_mirror.py sync --credentials service_account.json
+    python sheets_mirror.py status
+    python sheets_mirror.py export "Artwork Views" views.csv
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+import metrics
+from outbox import QUESTIONNAIRE_SHEET, SPREADSHEET_NAME, SUMMARY_SHEET, VIEWS_SHEET
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "sheets_mirror.sqlite3")
+DEFAULT_SHEETS = (VIEWS_SHEET, SUMMARY_SHEET, QUESTIONNAIRE_SHEET)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cursors (
+    sheet TEXT PRIMARY KEY,
+    header TEXT NOT NULL,
+    row_count INTEGER NOT NULL,
+    digest TEXT NOT NULL,
+    synced_at REAL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS rows (
+    sheet TEXT NOT NULL,
+    row_number INTEGER NOT NULL,
+    row_hash TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (sheet, row_number)
+) WITHOUT ROWID;
+"""
+
+EMPTY_DIGEST = hashlib.sha256(b"").hexdigest()
+
+
+def column_letter(number):
+    """Spreadsheet column name of a 1-based column number (1 -> A, 27 -> AA)"""
+    letters = ""
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def row_hash(row):
+    return hashlib.sha256(json.dumps(row, ensure_ascii=False).encode()).hexdigest()
+
+
+def chain(digest, hashed):
+    """Digest of all rows so far, extended by one row hash"""
+    return hashlib.sha256((digest + hashed).encode()).hexdigest()
+
+
+class SheetsMirror:
+    """SQLite copy of worksheets, synced by row cursor
+
+    `resolve_worksheet(name)` returns a gspread worksheet (or a fake with
+    the same `row_values` and `get` calls).
+    """
+
+    def __init__(self, resolve_worksheet, path=DEFAULT_PATH, batch_rows=1000):
+        self.resolve_worksheet = resolve_worksheet
+        self.path = path
+        self.batch_rows = batch_rows
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+
+    def cursor(self, sheet):
+        """(header, row_count, digest) of a mirrored worksheet, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT header, row_count, digest FROM cursors WHERE sheet = ?", (sheet,)
+            ).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1], row[2]
+
+    def _last_hash(self, sheet, row_count):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT row_hash FROM rows WHERE sheet = ? AND row_number = ?", (sheet, row_count)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _read(self, worksheet, width, first, last):
+        """Data rows `first`..`last` (1-based, header excluded), padded to the header width"""
+        metrics.incr("sheets_api_calls_total", method="get")
+        values = worksheet.get(f"A{first + 1}:{column_letter(width)}{last + 1}")
+        return [list(row[:width]) + [""] * (width - len(row)) for row in values]
+
+    def _reset(self, sheet, header):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM rows WHERE sheet = ?", (sheet,))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cursors (sheet, header, row_count, digest, synced_at) VALUES (?, ?, 0, ?, ?)",
+                    (sheet, json.dumps(header, ensure_ascii=False), EMPTY_DIGEST, time.time()),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _append(self, sheet, start, rows, digest):
+        params = []
+        for offset, row in enumerate(rows):
+            hashed = row_hash(row)
+            digest = chain(digest, hashed)
+            params.append((sheet, start + offset, hashed, json.dumps(row, ensure_ascii=False)))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO rows (sheet, row_number, row_hash, data) VALUES (?, ?, ?, ?)", params
+                )
+                self._conn.execute(
+                    "UPDATE cursors SET row_count = ?, digest = ?, synced_at = ? WHERE sheet = ?",
+                    (start + len(rows) - 1, digest, time.time(), sheet),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return digest
+
+    def sync(self, sheet):
+        """Fetch rows added since the last sync; returns the number of new rows"""
+        worksheet = self.resolve_worksheet(sheet)
+        state = self.cursor(sheet)
+        if state is None:
+            metrics.incr("sheets_api_calls_total", method="row_values")
+            header = worksheet.row_values(1)
+            if not header:
+                return 0
+            self._reset(sheet, header)
+            state = (header, 0, EMPTY_DIGEST)
+        header, row_count, digest = state
+        width = len(header)
+
+        added = 0
+        with metrics.span("mirror_sync"):
+            while True:
+                # Re-read the last mirrored row: a changed or shifted row means
+                # the mirrored rows no longer match the worksheet
+                overlap = 1 if row_count else 0
+                first = row_count + 1 - overlap
+                rows = self._read(worksheet, width, first, row_count + self.batch_rows)
+                if overlap:
+                    if not rows or row_hash(rows[0]) != self._last_hash(sheet, row_count):
+                        logger.warning("Worksheet %s changed at or above row %d; resyncing", sheet, row_count + 1)
+                        return self.resync(sheet)
+                    rows = rows[1:]
+                if rows:
+                    digest = self._append(sheet, row_count + 1, rows, digest)
+                    row_count += len(rows)
+                    added += len(rows)
+                if len(rows) < self.batch_rows:
+                    break
+        metrics.incr("mirror_rows_synced_total", added, sheet=sheet)
+        return added
+
+    def resync(self, sheet):
+        """Drop the local copy of a worksheet and fetch it again"""
+        with self._lock:
+            self._conn.execute("DELETE FROM rows WHERE sheet = ?", (sheet,))
+            self._conn.execute("DELETE FROM cursors WHERE sheet = ?", (sheet,))
+        return self.sync(sheet)
+
+    def sync_all(self, sheets=DEFAULT_SHEETS):
+        """Sync several worksheets; returns new row counts, skipping (and logging) failures"""
+        added = {}
+        for sheet in sheets:
+            try:
+                added[sheet] = self.sync(sheet)
+            except Exception as e:
+                logger.error("Could not sync worksheet %s: %s", sheet, e)
+        return added
+
+    def verify(self, sheet, repair=False):
+        """Compare row count, header and digest with the worksheet itself, reading it in batches"""
+        state = self.cursor(sheet)
+        if state is None:
+            return {"sheet": sheet, "ok": False, "local_rows": 0, "remote_rows": None}
+        header, row_count, digest = state
+        worksheet = self.resolve_worksheet(sheet)
+        metrics.incr("sheets_api_calls_total", method="row_values")
+        remote_header = worksheet.row_values(1)
+
+        # Rows added since the last sync are expected, so only the mirrored prefix is digested
+        remote_rows, remote_digest, first = 0, EMPTY_DIGEST, 1
+        while True:
+            rows = self._read(worksheet, len(header), first, first + self.batch_rows - 1)
+            for row in rows[:max(0, row_count - remote_rows)]:
+                remote_digest = chain(remote_digest, row_hash(row))
+            remote_rows += len(rows)
+            first += self.batch_rows
+            if len(rows) < self.batch_rows:
+                break
+        ok = remote_header[:len(header)] == header and remote_rows >= row_count and remote_digest == digest
+        if not ok and repair:
+            self.resync(sheet)
+        return {"sheet": sheet, "ok": ok, "local_rows": row_count, "remote_rows": remote_rows}
+
+    def frame(self, sheet):
+        """Mirrored rows of a worksheet as a DataFrame (all values as text, like the sheet)"""
+        state = self.cursor(sheet)
+        if state is None:
+            return pd.DataFrame()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT data FROM rows WHERE sheet = ? ORDER BY row_number", (sheet,)
+            ).fetchall()
+        return pd.DataFrame([json.loads(data) for data, in rows], columns=state[0])
+
+    def status(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT sheet, row_count, digest, synced_at FROM cursors ORDER BY sheet").fetchall()
+        return [{"sheet": sheet, "rows": count, "digest": digest, "synced_at": synced_at}
+                for sheet, count, digest, synced_at in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep a local mirror of the study worksheets")
+    parser.add_argument("--db", default=os.environ.get("DIGITALMUSEUM_MIRROR", DEFAULT_PATH))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("sync", "fetch new rows"), ("verify", "compare the mirror with the worksheets")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("--credentials", required=True, help="service account JSON file")
+        command.add_argument("--spreadsheet", default=SPREADSHEET_NAME)
+        command.add_argument("--sheets", nargs="+", default=list(DEFAULT_SHEETS))
+        if name == "verify":
+            command.add_argument("--repair", action="store_true", help="resync worksheets that do not match")
+
+    commands.add_parser("status", help="rows and last sync time per worksheet")
+
+    export_cmd = commands.add_parser("export", help="write a mirrored worksheet to CSV or Parquet")
+    export_cmd.add_argument("sheet")
+    export_cmd.add_argument("path")
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    resolve = None
+    if args.command in ("sync", "verify"):
+        import gspread
+        from sheets_connection import SheetsConnection
+
+        connection = SheetsConnection(lambda: gspread.service_account(filename=args.credentials),
+                                      spreadsheet_name=args.spreadsheet)
+        resolve = connection.worksheet
+    mirror = SheetsMirror(resolve, args.db)
+
+    if args.command == "sync":
+        for sheet, added in mirror.sync_all(args.sheets).items():
+            print(f"{sheet}: {added} new rows")
+    elif args.command == "verify":
+        for sheet in args.sheets:
+            result = mirror.verify(sheet, repair=args.repair)
+            print(f"{sheet}: {'ok' if result['ok'] else 'MISMATCH'} "
+                  f"(local {result['local_rows']}, remote {result['remote_rows']})")
+    elif args.command == "status":
+        for entry in mirror.status():
+            synced = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(entry["synced_at"])) if entry["synced_at"] else "-"
+            print(f"{entry['sheet']:24} {entry['rows']:>8} rows  synced {synced}  {entry['digest'][:12]}")
+    elif args.command == "export":
+        df = mirror.frame(args.sheet)
+        if args.path.endswith(".parquet"):
+            df.to_parquet(args.path, index=False)
+        else:
+            df.to_csv(args.path, index=False)
+        print(f"Wrote {len(df)} rows to '{args.path}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import metrics
+from retry import call_with_retries, is_retryable, status_code, was_rejected
+
+logger = logging.getLogger(__name__)
+
+
+def is_retryable_append(error):
+    """append_rows is not idempotent, so it is only retried after a rejection such as a quota error"""
+    return was_rejected(error) and is_retryable(error)
+
+
+class UnconfirmedAppend(Exception):
+    """A write failed after some of its rows may have reached the sheet"""
+
+    def __init__(self, error):
+        super().__init__(f"rows may have been written before the error: {error}")
+        # Keep the response so callers still see the status code
+        self.response = getattr(error, "response", None)
+
+
+def worksheet_key(sheet):
+    """Stable identity of a worksheet, used to cache its header state"""
+    spreadsheet = getattr(sheet, "spreadsheet", None)
+    return (getattr(spreadsheet, "id", None), getattr(sheet, "id", id(sheet)))
+
+
+class _Batch:
+    __slots__ = ("sheet", "header", "rows", "future")
+
+    def __init__(self, sheet, header, rows, future):
+        self.sheet = sheet
+        self.header = header
+        self.rows = rows
+        self.future = future
+
+
+class SheetsWriter:
+    """Write-behind writer that batches rows into append_rows calls per worksheet
+
+    Rows submitted from any session are queued and flushed by a single
+    background thread. Batches queued for the same worksheet are coalesced
+    into one append_rows call, the header row is checked only once per
+    worksheet and quota errors are retried with exponential backoff.
+
+    Appends are never retried after an error that may follow a successful
+    write (timeouts, server errors). The batches involved fail with
+    UnconfirmedAppend so the caller can check the sheet before resending.
+    """
+
+    def __init__(self, flush_interval=1.0, max_batch_rows=500, max_retries=5,
+                 backoff_base=1.0, backoff_max=60.0, sleep=time.sleep):
+        self.flush_interval = flush_interval
+        self.max_batch_rows = max_batch_rows
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._sleep = sleep
+        self._queue = queue.Queue()
+        self._header_written = {}
+        self._closed = threading.Event()
+        # Set once the background thread has exited; guarded by _stop_lock so
+        # nothing is queued after the thread has stopped reading the queue
+        self._stopped = False
+        self._stop_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="sheets-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, sheet, header, rows):
+        """Queue rows for a worksheet and return a Future resolved once they are written"""
+        future = Future()
+        batch = _Batch(sheet, list(header), [list(row) for row in rows], future)
+        with self._stop_lock:
+            if self._closed.is_set() or self._stopped:
+                future.set_exception(RuntimeError("SheetsWriter is closed"))
+                return future
+            self._queue.put(batch)
+        return future
+
+    def flush(self, timeout=None):
+        """Block until everything queued so far has been written (or failed)
+
+        Returns False on timeout, and straight away once the writer is closed.
+        """
+        marker = Future()
+        with self._stop_lock:
+            if self._stopped:
+                return False
+            self._queue.put(marker)
+        try:
+            return marker.result(timeout=timeout)
+        except Exception:
+            return False
+
+    def close(self, timeout=30):
+        """Flush pending rows and stop the background thread"""
+        if self._closed.is_set():
+            return
+        self.flush(timeout=timeout)
+        self._closed.set()
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+
+    def pending(self):
+        """Approximate number of batches waiting to be written"""
+        return self._queue.qsize()
+
+    def _run(self):
+        try:
+            self._process_queue()
+        finally:
+            self._reject_remaining()
+
+    def _reject_remaining(self):
+        """Fail everything still queued once the thread stops, so no caller waits forever"""
+        with self._stop_lock:
+            self._stopped = True
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if isinstance(item, _Batch):
+                item.future.set_exception(RuntimeError("SheetsWriter is closed"))
+            elif isinstance(item, Future):
+                item.set_result(False)
+
+    def _process_queue(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                if self._closed.is_set():
+                    return
+                continue
+            if item is None:
+                return
+
+            # Give concurrent sessions a moment to add their rows, then take
+            # everything that is queued so it can be written in one go
+            items = [item]
+            if not self._closed.is_set() and isinstance(item, _Batch):
+                self._sleep(min(self.flush_interval, 0.2))
+            while True:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            batches = [i for i in items if isinstance(i, _Batch)]
+            markers = [i for i in items if isinstance(i, Future)]
+            self._write_batches(batches)
+            for marker in markers:
+                marker.set_result(True)
+            if any(i is None for i in items):
+                return
+
+    def _write_batches(self, batches):
+        groups = {}
+        for batch in batches:
+            key = (worksheet_key(batch.sheet), tuple(batch.header))
+            groups.setdefault(key, []).append(batch)
+
+        for (sheet_key, header), group in groups.items():
+            sheet = group[0].sheet
+            rows = [row for batch in group for row in batch.rows]
+            offset = written = attempted = 0
+            try:
+                if not self._header_written.get(sheet_key):
+                    if self._with_retries(self._sheet_is_empty, sheet):
+                        rows.insert(0, list(header))
+                        offset = 1
+                for start in range(0, len(rows), self.max_batch_rows):
+                    chunk = rows[start:start + self.max_batch_rows]
+                    attempted = start + len(chunk)
+                    with metrics.span("sheets_append"):
+                        self._with_retries(self._append_rows, sheet, chunk, retryable=is_retryable_append)
+                    written = attempted
+                    self._header_written[sheet_key] = True
+            except Exception as e:
+                logger.error("Failed to write %d rows to worksheet %s: %s", len(rows) - written, sheet_key, e)
+                # Rows up to `written` are in the sheet; the failed chunk may be too
+                reached = written if was_rejected(e) else attempted
+                end = offset
+                for batch in group:
+                    start, end = end, end + len(batch.rows)
+                    if end <= written:
+                        batch.future.set_result(len(batch.rows))
+                    elif start < reached:
+                        batch.future.set_exception(UnconfirmedAppend(e))
+                    else:
+                        batch.future.set_exception(e)
+                continue
+            for batch in group:
+                batch.future.set_result(len(batch.rows))
+
+    def _append_rows(self, sheet, rows):
+        metrics.incr("sheets_api_calls_total", method="append_rows")
+        sheet.append_rows(rows, value_input_option="USER_ENTERED")
+        metrics.incr("sheets_rows_written_total", len(rows))
+
+    def _sheet_is_empty(self, sheet):
+        metrics.incr("sheets_api_calls_total", method="row_values")
+        first_row = sheet.row_values(1)
+        return len(first_row) == 0 or all(cell == '' for cell in first_row)
+
+    def _with_retries(self, func, *args, retryable=is_retryable):
+        return call_with_retries(
+            func, *args, retryable=retryable, max_retries=self.max_retries, backoff_base=self.backoff_base,
+            backoff_max=self.backoff_max, sleep=self._sleep, label="Sheets call",
+            on_error=lambda e: metrics.incr("sheets_api_errors_total", status=status_code(e) or "none"),
+        )
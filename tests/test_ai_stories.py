@@ -0,0 +1,75 @@
+from ai_stories import StoryCache, StoryGenerator, select_pending
+from fakes import FakeTextBackend
+
+
+def artworks(count):
+    return [{"id": f"A{n}", "title": f"Title {n}", "artist": "Artist", "description": f"Description {n}"}
+            for n in range(count)]
+
+
+def generator(backend, cache, **kwargs):
+    kwargs.setdefault("workers", 2)
+    return StoryGenerator(backend, cache, rate=1000, sleep=lambda seconds: None, **kwargs)
+
+
+def test_rerun_is_served_from_the_cache(tmp_path):
+    cache = StoryCache(str(tmp_path / "stories.sqlite3"))
+    backend = FakeTextBackend()
+    records = artworks(5)
+    assert generator(backend, cache, batch_size=2).run(records) == (0, 5, 0)
+    stories = [record["ai_story"] for record in records]
+
+    rerun = artworks(5)
+    assert generator(backend, cache, batch_size=2).run(rerun) == (5, 0, 0)
+    assert [record["ai_story"] for record in rerun] == stories
+    assert backend.calls == 3
+
+
+def test_changed_description_is_regenerated(tmp_path):
+    cache = StoryCache(str(tmp_path / "stories.sqlite3"))
+    backend = FakeTextBackend()
+    generator(backend, cache).run(artworks(3))
+
+    records = artworks(3)
+    records[1]["description"] = "A new description"
+    assert generator(backend, cache).run(records) == (2, 1, 0)
+    assert len(backend.prompts) == 4 and "A new description" in backend.prompts[-1]
+
+
+def test_quota_errors_are_retried(tmp_path):
+    cache = StoryCache(str(tmp_path / "stories.sqlite3"))
+    backend = FakeTextBackend(failures=[429, 429])
+    records = artworks(2)
+    assert generator(backend, cache, workers=1).run(records) == (0, 2, 0)
+    assert all(record["ai_story"].startswith("Generated story") for record in records)
+
+
+def test_prompts_are_retried_one_at_a_time_when_the_backend_takes_one(tmp_path):
+    cache = StoryCache(str(tmp_path / "stories.sqlite3"))
+    backend = FakeTextBackend(batch_size=1, failures=[None, None, 429])
+    assert generator(backend, cache, batch_size=8).run(artworks(4)) == (0, 4, 0)
+    # The failed request is the only one sent twice
+    assert backend.calls == 5 and len(backend.prompts) == 4
+
+
+def test_failed_generation_keeps_the_existing_story(tmp_path):
+    cache = StoryCache(str(tmp_path / "stories.sqlite3"))
+    backend = FakeTextBackend(failures=[400])
+    records = artworks(2)
+    pending, kept = select_pending(records, {"A0": "Story from last time"}, {"A0"})
+    assert kept == 0 and len(pending) == 2
+
+    assert generator(backend, cache, batch_size=1, workers=1).run(pending) == (0, 1, 1)
+    assert records[0]["ai_story"] == "Story from last time"
+    assert records[1]["ai_story"].startswith("Generated story")
+
+
+def test_hand_written_stories_are_kept_unless_regenerating():
+    records = artworks(2)
+    existing = {"A0": "Written by a curator"}
+    pending, kept = select_pending(records, existing, set())
+    assert kept == 1 and [record["id"] for record in pending] == ["A1"]
+    assert records[0]["ai_story"] == "Written by a curator"
+
+    pending, kept = select_pending(artworks(2), existing, set(), regenerate=True)
+    assert kept == 0 and len(pending) == 2
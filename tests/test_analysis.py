@@ -0,0 +1,94 @@
+import json
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis import artwork_dwell, compare_groups, participant_table
+
+
+def views():
+    return pd.DataFrame({
+        "user_code": ["U1", "U1", "U2", "U3", "U3"],
+        "group": ["AI ", "ai", "curator", "Curator", "curator"],
+        "artwork_id": ["A1", "A2", "A1", "A1", "A2"],
+        "title": ["One", "Two", "One", "One", "Two"],
+        "time_spent_seconds": ["10", "20", "5", "7", "not a number"],
+    })
+
+
+def summary():
+    preferences = {"A1": {"user_choice": "Description A", "description_A_source": "ai", "description_B_source": "curator"},
+                   "A2": {"user_choice": "Description A", "description_A_source": "curator", "description_B_source": "ai"}}
+    return pd.DataFrame({"user_code": ["U1", "U1"], "selected_ids": ["A1", "A1, A2"],
+                         "preferences": ["", json.dumps(preferences)]})
+
+
+def questionnaire():
+    return pd.DataFrame({"Participant code": ["U1", "U2", "U4"], "Group": ["AI", "Curator", "curator"],
+                         "Quality 1": [4, 2, 3], "Quality 2": [5, "n/a", 3]})
+
+
+def test_participant_table_joins_all_sources():
+    table = participant_table(views(), summary(), questionnaire()).set_index("user_code")
+    assert sorted(table.index) == ["U1", "U2", "U3", "U4"]
+    assert table["group"].to_dict() == {"U1": "ai", "U2": "curator", "U3": "curator", "U4": "curator"}
+    assert table.loc["U1", "dwell_total"] == 30 and table.loc["U3", "artworks_viewed"] == 1
+    # The later summary of a participant wins
+    assert table.loc["U1", "exhibition_size"] == 2 and table.loc["U1", "ai_choice_share"] == 0.5
+    assert table.loc["U2", "Quality_Avg"] == 2 and table.loc["U1", "Quality_Avg"] == 4.5
+    assert np.isnan(table.loc["U4", "dwell_total"])
+
+
+def test_participant_table_needs_a_code_column_to_join():
+    with pytest.raises(ValueError, match="code column"):
+        participant_table(views(), questionnaire=questionnaire().rename(columns={"Participant code": "Name"}))
+
+
+def groups_table(ai, curator, **extra):
+    table = pd.DataFrame({"group": ["ai"] * len(ai) + ["curator"] * len(curator), "score": ai + curator})
+    for name, column in extra.items():
+        table[name] = column
+    return table
+
+
+def test_compare_groups_is_reproducible_and_close_to_the_exact_test():
+    table = groups_table([10.0, 11.0, 12.0, 13.0], [0.0, 1.0, 2.0, 3.0])
+    first = compare_groups(table, resamples=4000, seed=7)
+    assert first.equals(compare_groups(table, resamples=4000, seed=7))
+
+    row = first.iloc[0]
+    assert row["difference"] == 10
+    assert 8 <= row["ci_low"] < 10 < row["ci_high"] <= 12
+    # Exactly 2 of the 70 ways to split the 8 values are as extreme as the observed one
+    assert row["permutation_p"] == pytest.approx(2 / 70, abs=0.01)
+
+
+def test_measure_missing_in_one_group_has_no_statistics():
+    table = groups_table([1.0, 2.0, 3.0], [2.0, 3.0, 4.0], ai_choice_share=[0.5, 0.25, 1.0, np.nan, np.nan, np.nan],
+                         exhibition_size=[3.0, 4.0, 5.0, 2.0, np.nan, np.nan])
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        comparison = compare_groups(table, resamples=500, seed=0).set_index("measure")
+
+    assert comparison.loc["score", "permutation_p"] > 0.1
+    for measure in ("ai_choice_share", "exhibition_size"):
+        row = comparison.loc[measure]
+        assert row[["difference", "ci_low", "ci_high", "permutation_p", "cohen_d"]].isna().all()
+    assert comparison.loc["ai_choice_share", "n_curator"] == 0
+    assert comparison.loc["exhibition_size", ["n_ai", "n_curator"]].tolist() == [3, 1]
+
+
+def test_compare_groups_needs_both_groups():
+    with pytest.raises(ValueError, match="both groups"):
+        compare_groups(groups_table([1.0, 2.0], []))
+
+
+def test_artwork_dwell_per_group():
+    stats = artwork_dwell(views()).set_index("artwork_id")
+    assert stats.loc["A1", "title"] == "One"
+    assert stats.loc["A1", "ai_mean"] == 10 and stats.loc["A1", "curator_count"] == 2
+    assert stats.loc["A1", "curator_mean"] == 6
+    # The unparseable dwell time is dropped, leaving no curator view of A2
+    assert np.isnan(stats.loc["A2", "curator_mean"])
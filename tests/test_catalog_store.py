@@ -0,0 +1,25 @@
+import json
+
+import catalog_store
+
+ARTWORKS = [
+    {"id": f"A{n}", "title": f"Title {n}", "artist": "Artist", "longTitle": f"Title {n}, 1650",
+     "image_url": f"https://example.org/{n}", "theme": "Portraits", "description": f"Description {n}",
+     "ai_story": f"Story {n}"}
+    for n in range(3)
+]
+
+
+def test_store_opens_from_paths_with_uri_characters(tmp_path):
+    directory = tmp_path / "data?#%20"
+    directory.mkdir()
+    json_path, db_path = str(directory / "metadata.json"), str(directory / "catalog.sqlite3")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(ARTWORKS, f)
+    assert catalog_store.build(json_path, db_path) == 3
+
+    store = catalog_store.open_store(json_path, db_path)
+    assert store is not None
+    assert store.texts("A1") == {"description": "Description 1", "ai_story": "Story 1"}
+    store.close()
+    assert catalog_store.load_museum_data(json_path, db_path)["id"].tolist() == ["A0", "A1", "A2"]
@@ -0,0 +1,62 @@
+import pytest
+
+from checkpoints import CheckpointStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = CheckpointStore(str(tmp_path / "checkpoints.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_unknown_participant_has_no_checkpoint(store):
+    assert store.load("ABCD") is None
+
+
+def test_deltas_rebuild_the_session_state(store):
+    store.set("ABCD", session_id="s1", index=0, sequence_ids=["SK-A-1", "SK-A-2"])
+    store.put("ABCD", "start_times", "SK-A-1", 100.0)
+    store.append("ABCD", "viewed_items", 0, {"artwork_id": "SK-A-1", "time_spent_seconds": 4.2})
+    store.update("ABCD", fields={"index": 1}, entries={"start_times": {"SK-A-2": 104.2}},
+                 items={"viewed_items": {1: {"artwork_id": "SK-A-2", "time_spent_seconds": 3.0}}})
+    store.set("ABCD", picked_artworks=["SK-A-2"])
+
+    assert store.load("ABCD") == {
+        "session_id": "s1",
+        "index": 1,
+        "sequence_ids": ["SK-A-1", "SK-A-2"],
+        "start_times": {"SK-A-1": 100.0, "SK-A-2": 104.2},
+        "viewed_items": [{"artwork_id": "SK-A-1", "time_spent_seconds": 4.2},
+                         {"artwork_id": "SK-A-2", "time_spent_seconds": 3.0}],
+        "picked_artworks": ["SK-A-2"],
+    }
+
+
+def test_list_items_keep_their_order_past_ten(store):
+    for index in range(12):
+        store.append("ABCD", "viewed_items", index, index)
+    assert store.load("ABCD")["viewed_items"] == list(range(12))
+
+
+def test_writing_an_item_again_replaces_it(store):
+    store.append("ABCD", "viewed_items", 0, "first")
+    store.append("ABCD", "viewed_items", 0, "again")
+    assert store.load("ABCD")["viewed_items"] == ["again"]
+
+
+def test_participants_are_kept_apart(store):
+    store.set("ABCD", index=3)
+    store.set("EFGH", index=5)
+    store.delete("ABCD")
+    assert store.load("ABCD") is None
+    assert store.load("EFGH") == {"index": 5}
+
+
+def test_expire_removes_participants_older_than_max_age(store):
+    store.set("ABCD", index=1)
+    assert store.expire(max_age=60) == 0
+    store.set("EFGH", index=2)
+    assert store.expire(max_age=-1) == 2
+    assert store.load("ABCD") is None
+    assert store.load("EFGH") is None
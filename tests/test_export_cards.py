@@ -0,0 +1,61 @@
+import json
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+import fakes
+from catalog import ArtworkCatalog
+from export_cards import exhibitions_from_summary, export
+from image_cache import ImageCache
+
+CATALOG = ArtworkCatalog.from_records([
+    {"id": f"A{n}", "title": f"Title {n}", "theme": "Portraits", "image_url": f"https://example.org/{n}=s0",
+     "description": f"Curator text {n}", "ai_story": f"AI text {n}"}
+    for n in range(3)
+])
+
+
+def preferences(*artwork_ids):
+    return json.dumps({aid: {"user_choice": "Description B", "description_A_source": "curator",
+                             "description_B_source": "ai"} for aid in artwork_ids})
+
+
+def test_exhibitions_from_summary():
+    summary = pd.DataFrame({
+        "user_code": ["ABCD", "ABCD", np.nan, "EF GH"],
+        "selected_ids": ["A0, A1", "A2, A9", "A1", "A0"],
+        "preferences": [preferences("A0", "A1"), preferences("A2", "A9"), np.nan, "{not json"],
+        "exhibition_title": ["First", "Second", np.nan, "Broken"],
+        "exhibition_description": ["", "Text", "Text", ""],
+    })
+    exhibitions, skipped = exhibitions_from_summary(summary, CATALOG)
+
+    assert skipped == 1
+    assert [name for name, _, _, _ in exhibitions] == ["ABCD", "ABCD-2", "exhibition-3"]
+    first, second, third = exhibitions
+    assert [page["description"] for page in first[3]] == ["AI text 0", "AI text 1"]
+    # Unknown artworks are left out, and rows without preferences have no pages
+    assert [page["id"] for page in second[3]] == ["A2"]
+    assert third[1] == "" and third[3] == []
+
+
+def test_export_writes_cards_and_counts_failures(tmp_path):
+    cache_root = str(tmp_path / "images")
+    session = fakes.FakeImageSession(size=(400, 300))
+    ImageCache(cache_root, session=session).get_many([artwork.image_url for artwork in CATALOG], "pdf")
+    summary = pd.DataFrame({"user_code": ["ABCD", "EFGH"], "selected_ids": ["A0, A1", "A2"],
+                            "preferences": [preferences("A0", "A1"), preferences("A2")],
+                            "exhibition_title": ["First", "Second"], "exhibition_description": ["", ""]})
+    exhibitions, _ = exhibitions_from_summary(summary, CATALOG)
+    # A title that is not text makes the render itself fail
+    exhibitions.append(("broken", None, "", []))
+
+    out_dir, zip_path = tmp_path / "cards", tmp_path / "cards.zip"
+    assert export(exhibitions, str(out_dir), str(zip_path), cache_root, workers=1) == (2, 1)
+    assert sorted(path.name for path in out_dir.iterdir()) == ["ABCD.pdf", "EFGH.pdf"]
+    with zipfile.ZipFile(zip_path) as archive:
+        assert sorted(archive.namelist()) == ["ABCD.pdf", "EFGH.pdf"]
+        assert archive.read("ABCD.pdf").startswith(b"%PDF")
+    # Only the seeding fetched images
+    assert len(session.requests) == 3
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+from fakes import FakeImageSession
+from image_cache import ImageCache, ImageUnavailable
+
+URL = "https://images.example/artwork=s0"
+
+
+def make_cache(tmp_path, **kwargs):
+    session = FakeImageSession(size=(640, 480), **{k: kwargs.pop(k) for k in ("latency", "missing") if k in kwargs})
+    return ImageCache(str(tmp_path / "images"), session=session, **kwargs), session
+
+
+def test_derivatives_share_one_download(tmp_path):
+    cache, session = make_cache(tmp_path)
+    grid = cache.get(URL, "grid")
+    cache.get(URL, "description")
+    assert cache.get(URL, "grid") == grid
+    assert session.requests == [URL]
+
+
+def test_get_or_url_does_not_download_on_the_calling_thread(tmp_path):
+    cache, session = make_cache(tmp_path, latency=0.5)
+    assert cache.get_or_url(URL, "full", wait=0) == URL
+
+    # The background fetch fills the cache for the next rerun
+    cache.prefetch(URL, "full").result(timeout=5)
+    assert isinstance(cache.get_or_url(URL, "full", wait=0), bytes)
+    assert session.requests == [URL]
+
+
+def test_get_or_url_waits_for_a_running_prefetch(tmp_path):
+    cache, _ = make_cache(tmp_path, latency=0.05)
+    cache.prefetch(URL, "full")
+    assert isinstance(cache.get_or_url(URL, "full", wait=5), bytes)
+
+
+def test_a_cold_page_waits_once_and_falls_back_to_urls(tmp_path):
+    cache, session = make_cache(tmp_path, latency=0.5, max_workers=4)
+    urls = [f"{URL}{n}" for n in range(4)]
+    started = time.monotonic()
+    assert cache.get_many_or_urls(urls, "grid", wait=0.1) == {url: url for url in urls}
+    assert time.monotonic() - started < 0.4
+
+    time.sleep(1)
+    thumbnails = cache.get_many_or_urls(urls + [""], "grid", wait=0)
+    assert list(thumbnails) == urls and all(isinstance(content, bytes) for content in thumbnails.values())
+    assert sorted(session.requests) == urls
+
+
+def test_failures_are_not_retried_until_they_expire(tmp_path):
+    cache, session = make_cache(tmp_path, missing=[URL], failure_ttl=0.5)
+    with pytest.raises(Exception):
+        cache.get(URL, "grid")
+    with pytest.raises(ImageUnavailable):
+        cache.get(URL, "description")
+    assert cache.get_or_url(URL, "full") == URL
+    assert cache.get_many([URL], "pdf") == {URL: None}
+    assert session.requests == [URL]
+
+    session.missing.clear()
+    time.sleep(0.6)
+    assert isinstance(cache.get(URL, "grid"), bytes)
@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+import ingest
+from fakes import CollectionAPIStub
+from ingest import Checkpoint, CollectionClient
+
+
+def art_objects(prefix, count):
+    return [{"objectNumber": f"{prefix}-{i}", "title": f"Artwork {i}", "principalOrFirstMaker": "Artist",
+             "longTitle": f"Artwork {i}, 1650", "webImage": {"url": f"https://images.example/{prefix}-{i}"}}
+            for i in range(count)]
+
+
+def client(stub, **kwargs):
+    # Retries back off for seconds; the stub answers immediately
+    return CollectionClient("key", stub.endpoint, rate=1000, sleep=lambda delay: None, **kwargs)
+
+
+def test_search_pages_through_all_results():
+    artworks = {"landscape": art_objects("SK-L", 25)}
+    with CollectionAPIStub(artworks) as stub:
+        found = list(client(stub).search("landscape", theme="landscape", page_size=10))
+
+    assert [artwork["id"] for artwork in found] == [f"SK-L-{i}" for i in range(25)]
+    assert found[0]["image_url"] == "https://images.example/SK-L-0"
+    assert found[0]["theme"] == "landscape"
+    assert len(stub.requests) == 3
+
+
+def test_search_stops_at_max_items():
+    with CollectionAPIStub({"animals": art_objects("SK-A", 25)}) as stub:
+        found = list(client(stub).search("animals", page_size=10, max_items=12))
+    assert len(found) == 12
+    assert len(stub.requests) == 2
+
+
+def test_rate_limited_requests_are_retried():
+    artworks = {"landscape": art_objects("SK-L", 6)}
+    descriptions = {f"SK-L-{i}": f"Description {i}" for i in range(6)}
+    # Every third request answers 429
+    with CollectionAPIStub(artworks, descriptions, fail_every=3) as stub:
+        api = client(stub)
+        found = list(api.search("landscape", page_size=4))
+        texts = [api.fetch_description(artwork["id"]) for artwork in found]
+
+    assert len(found) == 6
+    assert texts == [f"Description {i}" for i in range(6)]
+    assert len(stub.requests) > 8
+
+
+def test_retries_give_up_after_the_limit():
+    with CollectionAPIStub({"landscape": art_objects("SK-L", 3)}, fail_every=1) as stub:
+        with pytest.raises(Exception, match="429"):
+            list(client(stub, retries=2).search("landscape"))
+    assert len(stub.requests) == 3
+
+
+def test_ingest_deduplicates_by_object_number(tmp_path):
+    # The same object appears under two themes and twice in one result list
+    shared = art_objects("SK-S", 1)
+    artworks = {"landscape": art_objects("SK-L", 3) + shared + shared, "animals": shared + art_objects("SK-A", 2)}
+    descriptions = {artwork["objectNumber"]: "text" for results in artworks.values() for artwork in results}
+    with CollectionAPIStub(artworks, descriptions) as stub:
+        records = ingest.ingest(client(stub), Checkpoint(str(tmp_path / "checkpoint.jsonl")),
+                                ["landscape", "animals"], page_size=10, workers=2)
+        detail_requests = [path for path in stub.requests if not path.endswith("/collection")]
+
+    assert sorted(records) == ["SK-A-0", "SK-A-1", "SK-L-0", "SK-L-1", "SK-L-2", "SK-S-0"]
+    assert records["SK-S-0"]["theme"] == "landscape"
+    assert len(detail_requests) == 6
+
+
+def test_ingest_resumes_from_the_checkpoint(tmp_path):
+    artworks = {"landscape": art_objects("SK-L", 5)}
+    descriptions = {f"SK-L-{i}": f"Description {i}" for i in range(5)}
+    path = tmp_path / "checkpoint.jsonl"
+    done = {"id": "SK-L-0", "title": "Artwork 0", "theme": "landscape", "description": "Description 0"}
+    # A crash can leave a truncated last line
+    path.write_text(json.dumps(done) + "\n" + '{"id": "SK-L-1", "tit', encoding="utf-8")
+
+    with CollectionAPIStub(artworks, descriptions) as stub:
+        records = ingest.ingest(client(stub), Checkpoint(str(path)), ["landscape"], workers=2)
+        detail_requests = sorted(request.rsplit("/", 1)[-1] for request in stub.requests
+                                 if not request.endswith("/collection"))
+
+    assert detail_requests == ["SK-L-1", "SK-L-2", "SK-L-3", "SK-L-4"]
+    assert len(records) == 5
+    assert Checkpoint(str(path)).load().keys() == records.keys()
+
+
+def test_objects_without_a_detail_page_are_kept_without_description(tmp_path):
+    with CollectionAPIStub({"landscape": art_objects("SK-L", 2)}, {"SK-L-0": "text"}) as stub:
+        records = ingest.ingest(client(stub), Checkpoint(str(tmp_path / "checkpoint.jsonl")), ["landscape"])
+    assert records["SK-L-0"]["description"] == "text"
+    assert records["SK-L-1"]["description"] is None
+
+    output = tmp_path / "metadata.json"
+    assert ingest.export(records, str(output)) == 1
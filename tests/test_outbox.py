@@ -0,0 +1,165 @@
+import sqlite3
+
+import pytest
+
+from fakes import FakeAPIError, FakeWorksheet
+from outbox import PENDING, SENDING, SENT, UNCONFIRMED, Outbox, OutboxDrainer
+from sheets_writer import SheetsWriter
+
+HEADER = ["artwork_id", "user_code", "timestamp"]
+
+
+def session_rows(code, count=3):
+    return [[f"a{i}", code, "2025-01-01 10:00:00"] for i in range(count)]
+
+
+class AppliedThenFails(FakeWorksheet):
+    """Worksheet whose next append is written and then answered with a server error"""
+
+    def __init__(self, *args, fail_on_append=1, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fail_on_append = fail_on_append
+
+    def append_rows(self, values, value_input_option="RAW"):
+        super().append_rows(values, value_input_option)
+        self.fail_on_append -= 1
+        if self.fail_on_append == 0:
+            raise FakeAPIError(503)
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(str(tmp_path / "outbox.sqlite3"))
+    yield outbox
+    outbox.close()
+
+
+@pytest.fixture
+def writer():
+    writer = SheetsWriter(flush_interval=0.01, sleep=lambda delay: None)
+    yield writer
+    writer.close()
+
+
+def statuses(outbox):
+    return [record["status"] for record in outbox.records()]
+
+
+def test_adding_a_session_twice_stores_it_once(outbox):
+    records = {"Artwork Views": (HEADER, session_rows("ABCD"))}
+    assert outbox.add_session("ABCD", "s1", records) == 1
+    outbox.add_session("ABCD", "s1", records)
+    assert outbox.counts() == {PENDING: 1}
+
+
+def test_claim_and_mark_transitions(outbox):
+    outbox.add_session("ABCD", "s1", {"Artwork Views": (HEADER, session_rows("ABCD"))})
+    outbox.add_session("EFGH", "s2", {"Artwork Views": (HEADER, session_rows("EFGH"))})
+    first, second = outbox.claim()
+    assert statuses(outbox) == [SENDING, SENDING]
+
+    outbox.mark_sent(first["id"])
+    outbox.mark_failed(second["id"], "timeout", unconfirmed=True)
+    assert statuses(outbox) == [SENT, UNCONFIRMED]
+    outbox.claim()
+    outbox.mark_failed(second["id"], "rejected")
+    assert statuses(outbox) == [SENT, PENDING]
+    assert outbox.records()[1]["attempts"] == 2
+
+
+def test_only_the_drainer_owner_recovers_records_in_flight(tmp_path, outbox, writer):
+    outbox.add_session("ABCD", "s1", {"Artwork Views": (HEADER, session_rows("ABCD"))})
+    outbox.claim()
+
+    # Opening the outbox elsewhere, read-only or not, leaves in-flight records alone
+    Outbox(outbox.path).close()
+    reader = Outbox(outbox.path, readonly=True)
+    assert reader.counts() == {SENDING: 1}
+    with pytest.raises(sqlite3.OperationalError):
+        reader.replay()
+    reader.close()
+    assert statuses(outbox) == [SENDING]
+
+    drainer = OutboxDrainer(outbox, lambda name: FakeWorksheet(), writer, interval=3600)
+    drainer.start()
+    assert statuses(outbox) == [UNCONFIRMED]
+
+
+def test_drain_delivers_each_record_once(outbox, writer):
+    sheet = FakeWorksheet()
+    for code in ("ABCD", "EFGH"):
+        outbox.add_session(code, code, {"Artwork Views": (HEADER, session_rows(code))})
+    drainer = OutboxDrainer(outbox, lambda name: sheet, writer)
+
+    assert drainer.drain_once() == 2
+    assert drainer.drain_once() == 0
+    assert sheet.rows[0] == HEADER
+    assert len(sheet.rows) == 7
+    assert statuses(outbox) == [SENT, SENT]
+
+
+def test_append_that_may_have_been_applied_is_checked_before_resending(outbox, writer):
+    sheet = AppliedThenFails(rows=[HEADER])
+    outbox.add_session("ABCD", "s1", {"Artwork Views": (HEADER, session_rows("ABCD"))})
+    errors = []
+    drainer = OutboxDrainer(outbox, lambda name: sheet, writer, on_error=errors.append)
+
+    assert drainer.drain_once() == 0
+    # A server error is not retried: the rows may (and here did) reach the sheet
+    assert sheet.calls["append_rows"] == 1
+    assert statuses(outbox) == [UNCONFIRMED]
+    assert len(errors) == 1
+
+    assert drainer.drain_once() == 1
+    assert sheet.calls["append_rows"] == 1
+    assert len(sheet.rows) == 4
+    assert statuses(outbox) == [SENT]
+
+
+def test_failed_chunk_resends_only_the_missing_rows(outbox):
+    writer = SheetsWriter(flush_interval=0.01, max_batch_rows=2, sleep=lambda delay: None)
+    # The first chunk is written, the second one fails after it was applied
+    sheet = AppliedThenFails(rows=[HEADER], fail_on_append=2)
+    outbox.add_session("ABCD", "s1", {"Artwork Views": (HEADER, session_rows("ABCD", 5))})
+    drainer = OutboxDrainer(outbox, lambda name: sheet, writer)
+
+    drainer.drain_once()
+    assert statuses(outbox) == [UNCONFIRMED]
+    assert len(sheet.rows) == 5
+
+    drainer.drain_once()
+    writer.close()
+    assert statuses(outbox) == [SENT]
+    assert sheet.rows[1:] == session_rows("ABCD", 5)
+
+
+def test_rejected_records_go_back_to_pending(outbox, writer):
+    sheet = FakeWorksheet(rows=[HEADER], failures=[None, 400])
+    outbox.add_session("ABCD", "s1", {"Artwork Views": (HEADER, session_rows("ABCD"))})
+    drainer = OutboxDrainer(outbox, lambda name: sheet, writer)
+
+    assert drainer.drain_once() == 0
+    assert statuses(outbox) == [PENDING]
+    assert drainer.drain_once() == 1
+    assert len(sheet.rows) == 4
+
+
+def test_replayed_records_are_not_sent_twice(outbox, writer):
+    sheet = FakeWorksheet()
+    outbox.add_session("ABCD", "s1", {"Artwork Views": (HEADER, session_rows("ABCD"))})
+    drainer = OutboxDrainer(outbox, lambda name: sheet, writer)
+    drainer.drain_once()
+
+    assert outbox.replay([outbox.records()[0]["idempotency_key"]]) == 1
+    assert drainer.drain_once() == 1
+    assert len(sheet.rows) == 4
+
+
+def test_replay_leaves_records_in_flight_alone(outbox):
+    for code in ("ABCD", "EFGH"):
+        outbox.add_session(code, code, {"Artwork Views": (HEADER, session_rows(code))})
+    in_flight = outbox.claim(limit=1)[0]
+
+    assert outbox.replay() == 1
+    assert outbox.replay([in_flight["idempotency_key"]]) == 0
+    assert statuses(outbox) == [SENDING, UNCONFIRMED]
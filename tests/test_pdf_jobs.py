@@ -0,0 +1,93 @@
+import os
+import time
+
+import pytest
+
+import metrics
+from pdf_jobs import JobQueue, QueueFull
+
+
+def square(x):
+    return x * x
+
+
+def slow(x):
+    time.sleep(0.5)
+    return x
+
+
+def fail():
+    raise ValueError("cannot render")
+
+
+def crash():
+    os._exit(1)
+
+
+@pytest.fixture
+def jobs():
+    jobs = JobQueue(max_workers=1, max_pending=2)
+    yield jobs
+    jobs.shutdown(wait=False)
+
+
+def wait_for_callbacks():
+    # Done callbacks run on the executor's management thread
+    time.sleep(0.2)
+
+
+def test_jobs_with_the_same_key_run_once(jobs):
+    first = jobs.submit("a", square, 3)
+    assert jobs.submit("a", square, 3) is first
+    assert first.result(timeout=30) == 9
+    assert jobs.get("a") is first
+
+
+def test_too_many_pending_jobs_are_rejected(jobs):
+    jobs.submit("a", slow, 1)
+    jobs.submit("b", slow, 2)
+    with pytest.raises(QueueFull):
+        jobs.submit("c", slow, 3)
+
+
+def test_failed_jobs_are_kept_until_they_expire(jobs):
+    jobs.failure_ttl = 0.5
+    job = jobs.submit("a", fail)
+    with pytest.raises(ValueError):
+        job.result(timeout=30)
+    wait_for_callbacks()
+    # Polling sees the failure instead of a missing job
+    assert jobs.get("a") is job
+    assert jobs.submit("a", fail) is job
+
+    time.sleep(0.6)
+    assert jobs.get("a") is None
+
+
+def test_a_dead_worker_does_not_break_later_jobs(jobs):
+    job = jobs.submit("a", crash)
+    with pytest.raises(Exception):
+        job.result(timeout=30)
+    wait_for_callbacks()
+    # The crashed job is forgotten so it can be submitted again
+    assert jobs.get("a") is None
+
+    assert jobs.submit("b", square, 4).result(timeout=30) == 16
+
+
+def test_a_job_that_kills_its_worker_twice_counts_as_failed(jobs):
+    for _ in range(2):
+        job = jobs.submit("a", crash)
+        with pytest.raises(Exception):
+            job.result(timeout=30)
+        wait_for_callbacks()
+    assert jobs.get("a") is job
+
+
+def test_job_time_is_recorded_under_the_function_name(jobs, monkeypatch):
+    monkeypatch.setattr(metrics, "enabled", True)
+    metrics.reset()
+    jobs.submit("a", square, 3).result(timeout=30)
+    wait_for_callbacks()
+    assert 'stage_seconds_count{stage="square"} 1' in metrics.render()
+    metrics.reset()
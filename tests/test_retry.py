@@ -0,0 +1,52 @@
+import pytest
+
+from fakes import FakeAPIError, FakeHTTPResponse
+from retry import call_with_retries, is_retryable, was_rejected
+
+
+def failing(*errors, result="ok"):
+    errors = list(errors)
+
+    def call():
+        if errors:
+            raise errors.pop(0)
+        return result
+    return call
+
+
+def test_transient_errors_are_retried_with_growing_delays():
+    sleeps, seen = [], []
+    assert call_with_retries(failing(FakeAPIError(429), FakeAPIError(503), TimeoutError()),
+                             sleep=sleeps.append, on_error=seen.append) == "ok"
+    assert len(seen) == 3
+    assert 1.0 <= sleeps[0] <= 1.25 and 2.0 <= sleeps[1] <= 2.5 and 4.0 <= sleeps[2] <= 5.0
+
+
+def test_other_errors_are_raised_at_once():
+    sleeps = []
+    with pytest.raises(FakeAPIError, match="400"):
+        call_with_retries(failing(FakeAPIError(400)), sleep=sleeps.append)
+    with pytest.raises(ValueError):
+        call_with_retries(failing(ValueError("bad output")), sleep=sleeps.append)
+    assert sleeps == []
+
+
+def test_retries_stop_after_the_limit():
+    with pytest.raises(FakeAPIError):
+        call_with_retries(failing(*[FakeAPIError(500)] * 3), max_retries=2, sleep=lambda delay: None)
+
+
+def test_retry_after_header_sets_the_delay():
+    error = FakeAPIError(429)
+    error.response = FakeHTTPResponse(429)
+    error.response.headers["Retry-After"] = "7"
+    sleeps = []
+    call_with_retries(failing(error), sleep=sleeps.append)
+    assert sleeps == [7.0]
+
+
+def test_only_client_errors_are_known_not_to_be_applied():
+    assert was_rejected(FakeAPIError(429))
+    assert not was_rejected(FakeAPIError(503))
+    assert not was_rejected(TimeoutError())
+    assert is_retryable(FakeAPIError(503)) and not is_retryable(FakeAPIError(404))
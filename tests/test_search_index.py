@@ -0,0 +1,54 @@
+import pandas as pd
+
+from search_index import SearchIndex, tokenize
+
+RECORDS = [
+    {"id": "A0", "title": "The Night Watch", "artist": "Rembrandt van Rijn", "theme": "Portraits",
+     "description": "Militia company at night."},
+    {"id": "A1", "title": "The Milkmaid", "artist": "Johannes Vermeer", "theme": "Daily life",
+     "description": "A maid pours milk; Rembrandt's influence is debated."},
+    {"id": "A2", "title": "Self-portrait", "artist": "Rembrandt van Rijn", "theme": "Portraits",
+     "ai_story": "Painted late at night."},
+    {"id": "A3", "title": "Winter Landscape with Skaters", "artist": "Hendrick Avercamp", "theme": "Landscapes",
+     "description": "Skaters on a frozen river, à la mode."},
+]
+
+
+def index():
+    return SearchIndex.from_records(RECORDS)
+
+
+def test_tokenize_drops_case_and_accents():
+    assert tokenize("À la Mode, Café!") == ["a", "la", "mode", "cafe"]
+    assert tokenize(None) == []
+
+
+def test_every_word_must_match_as_a_prefix():
+    assert set(index().search("rem night").ids) == {"A0", "A2"}
+    assert index().search("vermeer night").ids == []
+    assert index().search("skat").ids == ["A3"]
+    # One-letter words only match whole tokens
+    assert index().search("m").ids == []
+
+
+def test_title_and_artist_matches_rank_first():
+    assert index().search("rembrandt").ids == ["A0", "A2", "A1"]
+    assert index().search("night").ids == ["A0", "A2"]
+
+
+def test_theme_facets_count_matches_before_the_theme_filter():
+    result = index().search("rembrandt", theme="Portraits")
+    assert result.ids == ["A0", "A2"] and result.total == 2
+    assert result.themes == {"Daily life": 1, "Landscapes": 0, "Portraits": 2}
+    assert index().themes() == {"Daily life": 1, "Landscapes": 1, "Portraits": 2}
+
+
+def test_pages_are_clamped_to_the_results():
+    result = index().search(page=5, page_size=3)
+    assert result.page == 1 and result.ids == ["A3"] and result.pages == 2
+    empty = index().search("nothing", page=2)
+    assert empty.page == 0 and empty.ids == [] and empty.pages == 1
+
+
+def test_index_from_a_dataframe():
+    assert SearchIndex.from_dataframe(pd.DataFrame(RECORDS)).search("milk").ids == ["A1"]
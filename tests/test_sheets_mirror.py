@@ -0,0 +1,66 @@
+from fakes import FakeWorksheet
+from sheets_mirror import SheetsMirror
+
+HEADER = ["user_code", "timestamp", "artwork_id"]
+
+
+def views(count, start=0):
+    return [[f"U{n % 3}", f"2024-01-01 10:{n:02d}:00", f"A{n}"] for n in range(start, start + count)]
+
+
+def mirror_of(worksheet, tmp_path, batch_rows=4):
+    return SheetsMirror({worksheet.title: worksheet}.get, str(tmp_path / "mirror.sqlite3"), batch_rows=batch_rows)
+
+
+def test_first_sync_reads_in_batches(tmp_path):
+    worksheet = FakeWorksheet("Artwork Views", [HEADER, *views(10)])
+    mirror = mirror_of(worksheet, tmp_path)
+    assert mirror.sync("Artwork Views") == 10
+    assert worksheet.calls["get"] == 3
+    assert mirror.frame("Artwork Views").values.tolist() == views(10)
+
+
+def test_later_syncs_read_only_new_rows(tmp_path):
+    worksheet = FakeWorksheet("Artwork Views", [HEADER, *views(5)])
+    mirror = mirror_of(worksheet, tmp_path, batch_rows=100)
+    mirror.sync("Artwork Views")
+    worksheet.rows.extend(views(2, start=5))
+    worksheet.calls.clear()
+
+    assert mirror.sync("Artwork Views") == 2
+    assert worksheet.calls == {"get": 1}
+    assert mirror.cursor("Artwork Views")[1] == 7
+    assert mirror.verify("Artwork Views")["ok"]
+
+
+def test_edit_of_the_last_mirrored_row_triggers_a_resync(tmp_path):
+    worksheet = FakeWorksheet("Artwork Views", [HEADER, *views(5)])
+    mirror = mirror_of(worksheet, tmp_path)
+    mirror.sync("Artwork Views")
+    worksheet.rows[5][2] = "edited"
+    del worksheet.rows[1]
+
+    assert mirror.sync("Artwork Views") == 4
+    assert mirror.frame("Artwork Views").values.tolist() == worksheet.rows[1:]
+
+
+def test_verify_finds_edits_above_the_cursor_and_repairs(tmp_path):
+    worksheet = FakeWorksheet("Artwork Views", [HEADER, *views(6)])
+    mirror = mirror_of(worksheet, tmp_path)
+    mirror.sync("Artwork Views")
+    worksheet.rows[2][2] = "edited"
+
+    # The last mirrored row is unchanged, so a sync does not notice
+    assert mirror.sync("Artwork Views") == 0
+    result = mirror.verify("Artwork Views", repair=True)
+    assert not result["ok"] and result["remote_rows"] == 6
+    assert mirror.frame("Artwork Views")["artwork_id"].tolist()[1] == "edited"
+    assert mirror.verify("Artwork Views")["ok"]
+
+
+def test_unknown_and_empty_worksheets(tmp_path):
+    worksheet = FakeWorksheet("Artwork Views")
+    mirror = mirror_of(worksheet, tmp_path)
+    assert mirror.sync("Artwork Views") == 0
+    assert mirror.frame("Artwork Views").empty
+    assert mirror.sync_all(["Artwork Views", "Missing"]) == {"Artwork Views": 0}
@@ -0,0 +1,68 @@
+import pytest
+
+from fakes import FakeAPIError, FakeSpreadsheet, FakeWorksheet
+from sheets_writer import SheetsWriter
+
+HEADER = ["user_code", "timestamp", "artwork_id"]
+
+
+def make_writer(**kwargs):
+    sleeps = []
+    writer = SheetsWriter(flush_interval=0.05, sleep=sleeps.append, **kwargs)
+    return writer, sleeps
+
+
+def test_batches_for_one_worksheet_share_an_append_call():
+    sheet = FakeSpreadsheet().add_worksheet("Artwork Views")
+    writer, _ = make_writer()
+    futures = [writer.submit(sheet, HEADER, [[f"u{i}", "t", "a1"], [f"u{i}", "t", "a2"]]) for i in range(5)]
+    assert writer.flush(timeout=5)
+    writer.close()
+
+    assert [future.result() for future in futures] == [2] * 5
+    assert sheet.rows[0] == HEADER
+    assert len(sheet.rows) == 11
+    assert sheet.calls["append_rows"] <= 2
+
+
+def test_header_is_written_once_per_worksheet():
+    sheet = FakeWorksheet(rows=[HEADER])
+    writer, _ = make_writer()
+    writer.submit(sheet, HEADER, [["u1", "t", "a1"]])
+    writer.flush(timeout=5)
+    writer.submit(sheet, HEADER, [["u2", "t", "a1"]])
+    writer.close()
+
+    assert sheet.rows.count(HEADER) == 1
+    assert sheet.calls["row_values"] == 1
+
+
+def test_quota_errors_are_retried_with_backoff():
+    sheet = FakeWorksheet(rows=[HEADER], failures=[None, 429, 429])
+    writer, sleeps = make_writer()
+    future = writer.submit(sheet, HEADER, [["u1", "t", "a1"]])
+    assert future.result(timeout=5) == 1
+    writer.close()
+
+    assert sheet.rows[-1] == ["u1", "t", "a1"]
+    assert sheet.calls["append_rows"] == 3
+    assert len([delay for delay in sleeps if delay >= 1.0]) == 2
+
+
+def test_non_retryable_errors_fail_the_batch():
+    sheet = FakeWorksheet(rows=[HEADER], failures=[None, 400])
+    writer, _ = make_writer()
+    future = writer.submit(sheet, HEADER, [["u1", "t", "a1"]])
+    with pytest.raises(FakeAPIError, match="400"):
+        future.result(timeout=5)
+    writer.close()
+    assert sheet.calls["append_rows"] == 1
+
+
+def test_flush_and_submit_after_close_return_immediately():
+    writer, _ = make_writer()
+    writer.close()
+
+    assert writer.flush() is False
+    with pytest.raises(RuntimeError):
+        writer.submit(FakeWorksheet(), HEADER, [["u1", "t", "a1"]]).result(timeout=1)